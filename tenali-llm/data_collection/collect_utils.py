@@ -0,0 +1,98 @@
+"""
+Helpers shared by the Tenali data collectors
+HTTP retry policy for rate-limited APIs, batched Yahoo downloads and resumable JSONL checkpoints
+"""
+
+from datetime import datetime
+import orjson
+import pandas as pd
+import yfinance as yf
+from tenacity import wait_exponential
+
+class RateLimitError(Exception):
+    """Server answered 429/5xx; carries its Retry-After delay in seconds if given"""
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.retry_after = int(retry_after) if retry_after and retry_after.isdigit() else None
+
+    @classmethod
+    def check(cls, response):
+        """Raise for a retryable (429/5xx) httpx response, raise_for_status for other errors"""
+        if response.status_code == 429 or response.status_code >= 500:
+            raise cls(response.status_code, response.headers.get('Retry-After'))
+        response.raise_for_status()
+
+_backoff = wait_exponential(multiplier=1, min=1, max=30)
+
+def wait_retry_after(retry_state):
+    """tenacity wait: sleep for Retry-After when the server sends it, otherwise back off exponentially"""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RateLimitError) and exc.retry_after is not None:
+        return exc.retry_after
+    return _backoff(retry_state)
+
+def batch_download(symbols, batch_size=20, cache=None, cache_tag='hist', cache_ttl=86400, **kwargs):
+    """Yield lists of (symbol, history), downloading `batch_size` tickers per yf.download request.
+    With a diskcache `cache`, histories are memoized per (cache_tag, symbol, UTC day) and only misses
+    are downloaded; `kwargs` go to yf.download (period=, start=, end=)"""
+    day = datetime.utcnow().strftime('%Y%m%d')
+    for i in range(0, len(symbols), batch_size):
+        chunk = symbols[i:i + batch_size]
+        cached = {symbol: cache.get((cache_tag, symbol, day)) if cache is not None else None for symbol in chunk}
+        missing = [symbol for symbol in chunk if cached[symbol] is None]
+        data = pd.DataFrame()
+        if missing:
+            try:
+                # auto_adjust=True matches Ticker.history()'s adjusted prices
+                data = yf.download(missing, group_by='ticker', threads=True, auto_adjust=True, progress=False, **kwargs)
+            except Exception as e:
+                print(f"Error downloading {missing}: {e}")
+        histories = []
+        for symbol in chunk:
+            hist = cached[symbol]
+            if hist is None:
+                try:
+                    hist = data[symbol] if isinstance(data.columns, pd.MultiIndex) else data
+                    # Rows are the union of all tickers' calendars; keep this ticker's own
+                    hist = hist.dropna(subset=['Close'])
+                except KeyError:
+                    hist = pd.DataFrame()
+                if cache is not None and not hist.empty:
+                    cache.set((cache_tag, symbol, day), hist, expire=cache_ttl)
+            histories.append((symbol, hist))
+        yield histories
+
+def load_checkpoint(filepath, key, version=None, max_age=None):
+    """`key` values already streamed to a JSONL output; a torn last line is truncated.
+    If `version` is given, a checkpoint holding a record with another 'version' or a 'collected_at'
+    date older than `max_age` is emptied so everything is re-collected"""
+    done = set()
+    if not filepath.exists():
+        return done
+    oldest = (datetime.now() - max_age).date().isoformat() if max_age is not None else ''
+    with open(filepath, 'r+b') as f:
+        valid_end = 0
+        for line in f:
+            try:
+                item = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                break
+            if version is not None and (item.get('version') != version or item.get('collected_at', '') < oldest):
+                print(f"Checkpoint {filepath} is stale; re-collecting")
+                done.clear()
+                valid_end = 0
+                break
+            done.add(item[key])
+            valid_end += len(line)
+        f.truncate(valid_end)
+    return done
+
+def write_jsonl(filepath, items):
+    """Write items as JSONL, one orjson line each; returns the number written"""
+    count = 0
+    # orjson emits UTF-8 bytes directly; 1 MiB buffer batches disk writes
+    with open(filepath, 'wb', buffering=1 << 20) as f:
+        for item in items:
+            f.write(orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY))
+            count += 1
+    return count
@@ -1,198 +1,302 @@
-"""
-Crypto Data Collection for Tenali LLM
-Collects: Prices, on-chain metrics, tokenomics, DeFi data
-Sources: CoinGecko, CoinMarketCap, Glassnode, The Graph
-"""
-
-import ccxt
-import requests
-import pandas as pd
-from datetime import datetime, timedelta
-import json
-from tqdm import tqdm
-import time
-import os
-
-class CryptoDataCollector:
-    def __init__(self, output_dir='./data/crypto'):
-        self.output_dir = output_dir
-        self.coingecko_base = 'https://api.coingecko.com/api/v3'
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-    def collect_crypto_prices(self, coin_ids):
-        """Collect crypto price data and metrics"""
-        print(f"Collecting data for {len(coin_ids)} cryptocurrencies...")
-        
-        all_data = []
-        
-        for coin_id in tqdm(coin_ids):
-            try:
-                # Get coin data
-                url = f"{self.coingecko_base}/coins/{coin_id}"
-                params = {
-                    'localization': 'false',
-                    'tickers': 'false',
-                    'community_data': 'true',
-                    'developer_data': 'true',
-                }
-                response = requests.get(url, params=params)
-                data = response.json()
-                
-                # Create training text
-                text = self._create_crypto_text(coin_id, data)
-                
-                all_data.append({
-                    'coin_id': coin_id,
-                    'text': text,
-                    'metadata': {
-                        'symbol': data.get('symbol', '').upper(),
-                        'market_cap_rank': data.get('market_cap_rank', 0),
-                    }
-                })
-                
-                time.sleep(1.5)  # Rate limiting
-                
-            except Exception as e:
-                print(f"Error collecting {coin_id}: {e}")
-                continue
-        
-        return all_data
-    
-    def _create_crypto_text(self, coin_id, data):
-        """Convert crypto data into training text"""
-        
-        text_parts = []
-        
-        # Overview
-        name = data.get('name', coin_id)
-        symbol = data.get('symbol', '').upper()
-        text_parts.append(f"## {name} ({symbol})")
-        
-        # Market Data
-        market_data = data.get('market_data', {})
-        current_price = market_data.get('current_price', {}).get('usd', 0)
-        market_cap = market_data.get('market_cap', {}).get('usd', 0)
-        volume_24h = market_data.get('total_volume', {}).get('usd', 0)
-        
-        text_parts.append(f"\n### Market Data")
-        text_parts.append(f"- **Price (USD)**: ${current_price:,.2f}")
-        text_parts.append(f"- **Market Cap**: ${market_cap/1e9:.2f}B")
-        text_parts.append(f"- **24h Volume**: ${volume_24h/1e9:.2f}B")
-        text_parts.append(f"- **Market Cap Rank**: #{data.get('market_cap_rank', 'N/A')}")
-        
-        # Price Changes
-        price_change_24h = market_data.get('price_change_percentage_24h', 0)
-        price_change_7d = market_data.get('price_change_percentage_7d', 0)
-        price_change_30d = market_data.get('price_change_percentage_30d', 0)
-        
-        text_parts.append(f"\n### Price Performance")
-        text_parts.append(f"- **24h Change**: {price_change_24h:+.2f}%")
-        text_parts.append(f"- **7d Change**: {price_change_7d:+.2f}%")
-        text_parts.append(f"- **30d Change**: {price_change_30d:+.2f}%")
-        
-        # All-Time High/Low
-        ath = market_data.get('ath', {}).get('usd', 0)
-        ath_date = market_data.get('ath_date', {}).get('usd', '')
-        atl = market_data.get('atl', {}).get('usd', 0)
-        
-        text_parts.append(f"\n### Historical Levels")
-        text_parts.append(f"- **All-Time High**: ${ath:,.2f} ({ath_date[:10] if ath_date else 'N/A'})")
-        text_parts.append(f"- **All-Time Low**: ${atl:,.8f}")
-        text_parts.append(f"- **From ATH**: {market_data.get('ath_change_percentage', {}).get('usd', 0):.2f}%")
-        
-        # On-Chain Metrics (if available)
-        text_parts.append(f"\n### On-Chain Metrics")
-        
-        # Circulating Supply
-        circulating_supply = market_data.get('circulating_supply', 0)
-        total_supply = market_data.get('total_supply', 0)
-        max_supply = market_data.get('max_supply', 0)
-        
-        text_parts.append(f"- **Circulating Supply**: {circulating_supply:,.0f} {symbol}")
-        if total_supply:
-            text_parts.append(f"- **Total Supply**: {total_supply:,.0f} {symbol}")
-        if max_supply:
-            text_parts.append(f"- **Max Supply**: {max_supply:,.0f} {symbol}")
-            text_parts.append(f"- **Supply Inflation**: {((total_supply - circulating_supply) / total_supply * 100):.2f}%")
-        
-        # Community & Development
-        community = data.get('community_data', {})
-        developer = data.get('developer_data', {})
-        
-        text_parts.append(f"\n### Community & Development")
-        text_parts.append(f"- **Twitter Followers**: {community.get('twitter_followers', 0):,}")
-        text_parts.append(f"- **Reddit Subscribers**: {community.get('reddit_subscribers', 0):,}")
-        text_parts.append(f"- **GitHub Stars**: {developer.get('stars', 0):,}")
-        text_parts.append(f"- **GitHub Forks**: {developer.get('forks', 0):,}")
-        
-        # Description
-        description = data.get('description', {}).get('en', '')
-        if description:
-            text_parts.append(f"\n### Description")
-            text_parts.append(description[:500] + "..." if len(description) > 500 else description)
-        
-        return "\n".join(text_parts)
-    
-    def collect_defi_data(self):
-        """Collect DeFi protocol data"""
-        # This would use DeFi Llama API or The Graph
-        defi_text = """
-## Decentralized Finance (DeFi)
-
-### Key Concepts
-
-**Total Value Locked (TVL)**
-- Measures capital locked in DeFi protocols
-- Indicator of DeFi ecosystem health
-- Top protocols: Aave, Uniswap, Curve, MakerDAO
-
-**Liquidity Pools**
-- Automated Market Makers (AMMs)
-- Provide liquidity for token swaps
-- Earn fees and rewards
-
-**Yield Farming**
-- Lending and borrowing protocols
-- Liquidity mining incentives
-- Risk: Impermanent loss, smart contract risk
-
-**Tokenomics**
-- Utility tokens vs governance tokens
-- Token distribution and vesting
-- Inflation and burn mechanisms
-"""
-        
-        return [{'category': 'DeFi', 'text': defi_text}]
-    
-    def save_data(self, data, filename):
-        """Save collected data as JSONL"""
-        filepath = f"{self.output_dir}/{filename}"
-        with open(filepath, 'w') as f:
-            for item in data:
-                f.write(json.dumps(item) + '\n')
-        print(f"Saved {len(data)} items to {filepath}")
-
-if __name__ == "__main__":
-    collector = CryptoDataCollector()
-    
-    # Expanded top 50 cryptocurrencies
-    top_coins = [
-        'bitcoin', 'ethereum', 'tether', 'binancecoin', 'solana', 'ripple', 'usd-coin', 'staked-ether', 'cardano', 'avalanche-2',
-        'dogecoin', 'tron', 'polkadot', 'chainlink', 'matic-network', 'wrapped-bitcoin', 'shiba-inu', 'dai', 'litecoin', 'bitcoin-cash',
-        'uniswap', 'leo-token', 'okb', 'stellar', 'monero', 'cosmos', 'ethereum-classic', 'internet-computer', 'hedera-hashgraph', 'filecoin',
-        'lido-dao', 'aptos', 'cronos', 'quant-network', 'arbitrum', 'vechain', 'near', 'maker', 'aave', 'optimism',
-        'the-graph', 'algorand', 'render-token', 'fantom', 'eos', 'tezos', 'axie-infinity', 'sandbox', 'decentraland', 'theta-token'
-    ]
-    
-    # Collect crypto data
-    print("Collecting cryptocurrency data...")
-    crypto_data = collector.collect_crypto_prices(top_coins)
-    collector.save_data(crypto_data, 'crypto_prices.jsonl')
-    
-    # Collect DeFi data
-    print("Collecting DeFi data...")
-    defi_data = collector.collect_defi_data()
-    collector.save_data(defi_data, 'defi_protocols.jsonl')
-    
-    print("Crypto data collection complete!")
+"""
+Crypto Data Collection for Tenali LLM
+Collects: Prices, on-chain metrics, tokenomics, DeFi data
+Sources: CoinGecko, CoinMarketCap, Glassnode, The Graph
+"""
+
+import ccxt
+import httpx
+import asyncio
+import pandas as pd
+import diskcache
+from cachetools import LRUCache
+from datetime import datetime, timedelta, date
+import itertools
+from functools import reduce
+from tqdm import tqdm
+import os
+from tenacity import retry, retry_if_exception_type, stop_after_attempt
+from collect_utils import RateLimitError, wait_retry_after, write_jsonl
+
+# Formatting tables for _create_crypto_text: (label, path into the CoinGecko
+# payload, format spec, scale, default when missing)
+MARKET_FIELDS = (
+    ('Price (USD)', ('market_data', 'current_price', 'usd'), '${:,.2f}', 1, 0),
+    ('Market Cap', ('market_data', 'market_cap', 'usd'), '${:.2f}B', 1e-9, 0),
+    ('24h Volume', ('market_data', 'total_volume', 'usd'), '${:.2f}B', 1e-9, 0),
+    ('Market Cap Rank', ('market_cap_rank',), '#{}', 1, 'N/A'),
+)
+PERFORMANCE_FIELDS = (
+    ('24h Change', ('market_data', 'price_change_percentage_24h'), '{:+.2f}%', 1, 0),
+    ('7d Change', ('market_data', 'price_change_percentage_7d'), '{:+.2f}%', 1, 0),
+    ('30d Change', ('market_data', 'price_change_percentage_30d'), '{:+.2f}%', 1, 0),
+)
+COMMUNITY_FIELDS = (
+    ('Twitter Followers', ('community_data', 'twitter_followers'), '{:,}', 1, 0),
+    ('Reddit Subscribers', ('community_data', 'reddit_subscribers'), '{:,}', 1, 0),
+    ('GitHub Stars', ('developer_data', 'stars'), '{:,}', 1, 0),
+    ('GitHub Forks', ('developer_data', 'forks'), '{:,}', 1, 0),
+)
+
+def _dig(data, path, default=0):
+    """Walk a nested dict along `path`, returning `default` for missing/null values"""
+    value = reduce(lambda d, key: d.get(key) if isinstance(d, dict) else None, path, data)
+    return default if value is None else value
+
+def _markets_to_coin(item):
+    """Reshape a /coins/markets row into the /coins/{id} layout _create_crypto_text reads"""
+    usd = lambda key: {'usd': item.get(key)}
+    return {
+        'name': item.get('name'),
+        'symbol': item.get('symbol', ''),
+        'market_cap_rank': item.get('market_cap_rank'),
+        'market_data': {
+            'current_price': usd('current_price'),
+            'market_cap': usd('market_cap'),
+            'total_volume': usd('total_volume'),
+            'price_change_percentage_24h': item.get('price_change_percentage_24h_in_currency'),
+            'price_change_percentage_7d': item.get('price_change_percentage_7d_in_currency'),
+            'price_change_percentage_30d': item.get('price_change_percentage_30d_in_currency'),
+            'ath': usd('ath'),
+            'ath_date': usd('ath_date'),
+            'atl': usd('atl'),
+            'ath_change_percentage': usd('ath_change_percentage'),
+            'circulating_supply': item.get('circulating_supply'),
+            'total_supply': item.get('total_supply'),
+            'max_supply': item.get('max_supply'),
+        },
+    }
+
+class CryptoDataCollector:
+    def __init__(self, output_dir='./data/crypto'):
+        self.output_dir = output_dir
+        self.coingecko_base = 'https://api.coingecko.com/api/v3'
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        # Two-level cache: in-process LRU for the hot set (bounded, payloads and rendered text
+        # share it), disk for re-runs (24h)
+        self._memory_cache = LRUCache(maxsize=512)
+        self.cache = diskcache.Cache(os.path.join(output_dir, 'cg_cache'))
+        
+    def _cache_get(self, key):
+        """Look up a key in memory first, then on disk (promoting disk hits)"""
+        value = self._memory_cache.get(key)
+        if value is not None:
+            return value
+        value = self.cache.get(key)
+        if value is not None:
+            self._memory_cache[key] = value
+        return value
+    
+    def _cache_set(self, key, value):
+        self._memory_cache[key] = value
+        self.cache.set(key, value, expire=86400)
+        
+    def collect_crypto_prices(self, coin_ids):
+        """Collect crypto price data and metrics"""
+        return asyncio.run(self.collect_crypto_prices_async(coin_ids))
+
+    @retry(wait=wait_retry_after, stop=stop_after_attempt(5), retry=retry_if_exception_type(RateLimitError), reraise=True)
+    async def _get_json(self, client, path, params):
+        """GET a CoinGecko endpoint; 429/5xx are retried (honouring Retry-After), other errors raise"""
+        response = await client.get(f"{self.coingecko_base}{path}", params=params)
+        RateLimitError.check(response)
+        return response.json()
+    
+    async def _fetch_markets(self, client, coin_ids):
+        """Batch price/market data via /coins/markets (250 ids per request), keyed by coin id"""
+        markets = {}
+        for i in range(0, len(coin_ids), 250):
+            chunk = coin_ids[i:i + 250]
+            try:
+                items = await self._get_json(client, "/coins/markets", {
+                    'vs_currency': 'usd',
+                    'ids': ','.join(chunk),
+                    'per_page': 250,
+                    'price_change_percentage': '24h,7d,30d',
+                })
+            except Exception as e:
+                # Coins missing from `markets` are reported (and skipped) by fetch_coin
+                print(f"Error fetching markets for {len(chunk)} coins: {e}")
+                continue
+            for item in items:
+                markets[item['id']] = _markets_to_coin(item)
+        return markets
+    
+    async def collect_crypto_prices_async(self, coin_ids, concurrency=4, detail_limit=20):
+        """Collect crypto price data: one batched /coins/markets call, plus rate-limited
+        /coins/{id} detail (community, developer, description) for the top `detail_limit` coins"""
+        print(f"Collecting data for {len(coin_ids)} cryptocurrencies...")
+        
+        params = {
+            'localization': 'false',
+            'tickers': 'false',
+            'community_data': 'true',
+            'developer_data': 'true',
+        }
+        sem = asyncio.Semaphore(concurrency)
+        today = date.today().isoformat()
+        pbar = tqdm(total=len(coin_ids))
+        
+        async def fetch_coin(client, coin_id):
+            try:
+                data = self._cache_get((coin_id, today))
+                if data is None:
+                    if coin_id in detail_ids:
+                        async with sem:
+                            # Get full coin data; a non-200 raises before anything is cached
+                            data = await self._get_json(client, f"/coins/{coin_id}", params)
+                            await asyncio.sleep(1.5)  # Rate limiting
+                    else:
+                        data = markets[coin_id]
+                    self._cache_set((coin_id, today), data)
+                
+                # Create training text (second cache level skips re-rendering)
+                text = self._cache_get(('text', coin_id, today))
+                if text is None:
+                    text = self._create_crypto_text(coin_id, data)
+                    self._cache_set(('text', coin_id, today), text)
+                
+                return {
+                    'coin_id': coin_id,
+                    'text': text,
+                    'metadata': {
+                        'symbol': data.get('symbol', '').upper(),
+                        'market_cap_rank': data.get('market_cap_rank', 0),
+                    }
+                }
+            except Exception as e:
+                print(f"Error collecting {coin_id}: {e}")
+                return None
+            finally:
+                pbar.update(1)
+        
+        detail_ids = set(coin_ids[:detail_limit])
+        async with httpx.AsyncClient(timeout=30) as client:
+            missing = [c for c in coin_ids if c not in detail_ids and self._cache_get((c, today)) is None]
+            markets = await self._fetch_markets(client, missing) if missing else {}
+            results = await asyncio.gather(*(fetch_coin(client, coin_id) for coin_id in coin_ids))
+        pbar.close()
+        
+        # gather preserves input order, so output stays in market-cap order
+        return [item for item in results if item is not None]
+    
+    def _create_crypto_text(self, coin_id, data):
+        """Convert crypto data into training text"""
+        
+        # Overview
+        name = data.get('name', coin_id)
+        symbol = data.get('symbol', '').upper()
+        market_data = data.get('market_data') or {}
+        
+        def section(title, fields):
+            yield f"\n### {title}"
+            for label, path, fmt, scale, default in fields:
+                value = _dig(data, path, default)
+                yield f"- **{label}**: " + fmt.format(value * scale if scale != 1 else value)
+        
+        # All-Time High/Low
+        ath = _dig(market_data, ('ath', 'usd'))
+        ath_date = _dig(market_data, ('ath_date', 'usd'), '')
+        atl = _dig(market_data, ('atl', 'usd'))
+        ath_change = _dig(market_data, ('ath_change_percentage', 'usd'))
+        
+        # On-Chain Metrics: supply
+        circulating_supply = market_data.get('circulating_supply') or 0
+        total_supply = market_data.get('total_supply') or 0
+        max_supply = market_data.get('max_supply') or 0
+        
+        supply_lines = [f"- **Circulating Supply**: {circulating_supply:,.0f} {symbol}"]
+        if total_supply:
+            supply_lines.append(f"- **Total Supply**: {total_supply:,.0f} {symbol}")
+        if max_supply:
+            supply_lines.append(f"- **Max Supply**: {max_supply:,.0f} {symbol}")
+            supply_lines.append(f"- **Supply Inflation**: {((total_supply - circulating_supply) / total_supply * 100):.2f}%")
+        
+        # Community & Development: only /coins/{id} detail carries these blocks; /coins/markets
+        # rows don't, and zeros there would be made-up numbers
+        community_fields = tuple(f for f in COMMUNITY_FIELDS if data.get(f[1][0]))
+        community_lines = section("Community & Development", community_fields) if community_fields else ()
+        
+        # Description
+        description = _dig(data, ('description', 'en'), '')
+        description_lines = ()
+        if description:
+            description_lines = ("\n### Description", description[:500] + "..." if len(description) > 500 else description)
+        
+        return "\n".join(itertools.chain(
+            (f"## {name} ({symbol})",),
+            section("Market Data", MARKET_FIELDS),
+            section("Price Performance", PERFORMANCE_FIELDS),
+            (
+                "\n### Historical Levels",
+                f"- **All-Time High**: ${ath:,.2f} ({ath_date[:10] if ath_date else 'N/A'})",
+                f"- **All-Time Low**: ${atl:,.8f}",
+                f"- **From ATH**: {ath_change:.2f}%",
+                "\n### On-Chain Metrics",
+            ),
+            supply_lines,
+            community_lines,
+            description_lines,
+        ))
+    
+    def collect_defi_data(self):
+        """Collect DeFi protocol data"""
+        # This would use DeFi Llama API or The Graph
+        defi_text = """
+## Decentralized Finance (DeFi)
+
+### Key Concepts
+
+**Total Value Locked (TVL)**
+- Measures capital locked in DeFi protocols
+- Indicator of DeFi ecosystem health
+- Top protocols: Aave, Uniswap, Curve, MakerDAO
+
+**Liquidity Pools**
+- Automated Market Makers (AMMs)
+- Provide liquidity for token swaps
+- Earn fees and rewards
+
+**Yield Farming**
+- Lending and borrowing protocols
+- Liquidity mining incentives
+- Risk: Impermanent loss, smart contract risk
+
+**Tokenomics**
+- Utility tokens vs governance tokens
+- Token distribution and vesting
+- Inflation and burn mechanisms
+"""
+        
+        return [{'category': 'DeFi', 'text': defi_text}]
+    
+    def save_data(self, data, filename):
+        """Save collected data as JSONL"""
+        filepath = f"{self.output_dir}/{filename}"
+        count = write_jsonl(filepath, data)
+        print(f"Saved {count} items to {filepath}")
+
+if __name__ == "__main__":
+    collector = CryptoDataCollector()
+    
+    # Expanded top 50 cryptocurrencies
+    top_coins = [
+        'bitcoin', 'ethereum', 'tether', 'binancecoin', 'solana', 'ripple', 'usd-coin', 'staked-ether', 'cardano', 'avalanche-2',
+        'dogecoin', 'tron', 'polkadot', 'chainlink', 'matic-network', 'wrapped-bitcoin', 'shiba-inu', 'dai', 'litecoin', 'bitcoin-cash',
+        'uniswap', 'leo-token', 'okb', 'stellar', 'monero', 'cosmos', 'ethereum-classic', 'internet-computer', 'hedera-hashgraph', 'filecoin',
+        'lido-dao', 'aptos', 'cronos', 'quant-network', 'arbitrum', 'vechain', 'near', 'maker', 'aave', 'optimism',
+        'the-graph', 'algorand', 'render-token', 'fantom', 'eos', 'tezos', 'axie-infinity', 'sandbox', 'decentraland', 'theta-token'
+    ]
+    
+    # Collect crypto data
+    print("Collecting cryptocurrency data...")
+    crypto_data = collector.collect_crypto_prices(top_coins)
+    collector.save_data(crypto_data, 'crypto_prices.jsonl')
+    
+    # Collect DeFi data
+    print("Collecting DeFi data...")
+    defi_data = collector.collect_defi_data()
+    collector.save_data(defi_data, 'defi_protocols.jsonl')
+    
+    print("Crypto data collection complete!")
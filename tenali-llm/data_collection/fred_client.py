@@ -0,0 +1,76 @@
+"""
+FRED REST client shared by the economic and historical collectors
+Series are fetched over one pooled HTTP/2 connection and memoized on disk for 24h
+"""
+
+import httpx
+import numpy as np
+import orjson
+import pandas as pd
+from tenacity import retry, retry_if_exception_type, stop_after_attempt
+from collect_utils import RateLimitError, wait_retry_after
+
+FRED_OBSERVATIONS_URL = 'https://api.stlouisfed.org/fred/series/observations'
+
+class FredClient:
+    """
+    Mixin for collectors that read FRED. The host class sets `fred_api_key` and `cache`
+    (a diskcache.Cache) and is used as `async with collector:` around the fetches.
+    """
+    _client = None
+    
+    async def __aenter__(self):
+        # One pooled HTTP/2 client; concurrent FRED requests multiplex over a single connection
+        self._client = httpx.AsyncClient(
+            http2=True,
+            timeout=30,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=10),
+        )
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+    
+    @retry(wait=wait_retry_after, stop=stop_after_attempt(5), retry=retry_if_exception_type(RateLimitError), reraise=True)
+    async def _fetch_series(self, series_id, **params):
+        """Fetch one FRED series from the REST API as a date-indexed pd.Series"""
+        query = {'series_id': series_id, 'api_key': self.fred_api_key, 'file_type': 'json', **params}
+        response = await self._client.get(FRED_OBSERVATIONS_URL, params=query)
+        RateLimitError.check(response)
+        payload = orjson.loads(response.content)
+        observations = payload['observations']
+        # FRED marks missing observations with '.', which becomes NaN
+        return pd.Series(
+            pd.to_numeric([o['value'] for o in observations], errors='coerce'),
+            index=pd.to_datetime([o['date'] for o in observations], format='%Y-%m-%d'),
+            name=series_id,
+        )
+    
+    async def _get_series_cached(self, series_id, **params):
+        """FRED fetch memoized on disk for 24h, keyed on (series_id, observation_start)"""
+        key = ('fred', series_id, params.get('observation_start'))
+        data = self.cache.get(key)
+        if data is None:
+            data = await self._fetch_series(series_id, **params)
+            self.cache.set(key, data, expire=86400)
+        return data
+    
+    def _series_stats(self, series_id, data):
+        """Summary scalars for a series, memoized on disk by (series_id, length, last date)"""
+        key = ('stats', series_id, len(data), data.index[-1])
+        stats = self.cache.get(key)
+        if stats is None:
+            arr = data.to_numpy()
+            max_pos, min_pos = np.nanargmax(arr), np.nanargmin(arr)
+            max_date, min_date = data.index[[max_pos, min_pos]].strftime('%Y-%m-%d')
+            stats = {
+                'mean': np.nanmean(arr),
+                'avg_5y': np.nanmean(arr[-60:]),
+                'max': arr[max_pos],
+                'min': arr[min_pos],
+                'max_date': max_date,
+                'min_date': min_date,
+            }
+            self.cache.set(key, stats, expire=86400)
+        return stats
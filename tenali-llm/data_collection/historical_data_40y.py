@@ -1,288 +1,376 @@
-"""
-Enhanced Historical Data Collection (40+ Years)
-Collects comprehensive market and economic data dating back to 1980s
-"""
-
-import yfinance as yf
-import pandas as pd
-from fredapi import Fred
-from datetime import datetime, timedelta
-import json
-from tqdm import tqdm
-import time
-
-class HistoricalDataCollector:
-    def __init__(self, fred_api_key, output_dir='./data/historical'):
-        self.fred = Fred(api_key=fred_api_key)
-        self.output_dir = output_dir
-        
-    def collect_40_years_stock_data(self):
-        """Collect 40+ years of stock market data"""
-        print("Collecting 40+ years of stock market data...")
-        
-        # Calculate date range (40 years)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=40*365)
-        
-        symbols_with_history = {
-            # US Indices (90+ years available)
-            '^GSPC': 'S&P 500',
-            '^DJI': 'Dow Jones Industrial Average',
-            '^IXIC': 'Nasdaq Composite',
-            
-            # Indian Indices
-            '^NSEI': 'Nifty 50',
-            '^BSESN': 'Sensex',
-            
-            # Major US Stocks (40+ years)
-            'AAPL': 'Apple Inc.',
-            'MSFT': 'Microsoft Corporation',
-            'IBM': 'IBM',
-            'GE': 'General Electric',
-            'JNJ': 'Johnson & Johnson',
-            'PG': 'Procter & Gamble',
-            'KO': 'Coca-Cola',
-            'XOM': 'Exxon Mobil',
-            'JPM': 'JPMorgan Chase',
-            'WMT': 'Walmart',
-            
-            # Indian Stocks (30+ years)
-            'RELIANCE.NS': 'Reliance Industries',
-            'TCS.NS': 'Tata Consultancy Services',
-            'HDFCBANK.NS': 'HDFC Bank',
-            'INFY.NS': 'Infosys',
-            'ITC.NS': 'ITC Limited',
-        }
-        
-        all_data = []
-        
-        for symbol, name in tqdm(symbols_with_history.items()):
-            try:
-                ticker = yf.Ticker(symbol)
-                
-                # Get maximum available history
-                hist = ticker.history(start=start_date, end=end_date)
-                
-                if len(hist) == 0:
-                    print(f"No data for {symbol}")
-                    continue
-                
-                # Create comprehensive training text
-                text = self._create_historical_text(symbol, name, hist)
-                
-                all_data.append({
-                    'symbol': symbol,
-                    'name': name,
-                    'text': text,
-                    'years_of_data': len(hist) / 252,  # Trading days per year
-                    'start_date': hist.index[0].strftime('%Y-%m-%d'),
-                    'end_date': hist.index[-1].strftime('%Y-%m-%d'),
-                })
-                
-                time.sleep(0.5)  # Rate limiting
-                
-            except Exception as e:
-                print(f"Error collecting {symbol}: {e}")
-                continue
-        
-        return all_data
-    
-    def collect_40_years_economic_data(self):
-        """Collect 40+ years of economic indicators"""
-        print("Collecting 40+ years of economic data...")
-        
-        # Start from 1980 (44 years ago)
-        start_date = '1980-01-01'
-        
-        indicators = {
-            # US Economic Data
-            'GDP': ('GDP', 'Gross Domestic Product'),
-            'CPIAUCSL': ('CPI', 'Consumer Price Index (Inflation)'),
-            'UNRATE': ('Unemployment', 'Unemployment Rate'),
-            'DFF': ('Fed Funds Rate', 'Federal Funds Effective Rate'),
-            'DGS10': ('10Y Treasury', '10-Year Treasury Constant Maturity Rate'),
-            'DGS2': ('2Y Treasury', '2-Year Treasury Constant Maturity Rate'),
-            'DEXUSEU': ('USD/EUR', 'US Dollar to Euro Exchange Rate'),
-            'DEXJPUS': ('USD/JPY', 'US Dollar to Japanese Yen'),
-            'DEXINUS': ('USD/INR', 'US Dollar to Indian Rupee'),
-            'GOLDAMGBD228NLBM': ('Gold Price', 'Gold Fixing Price'),
-            'DCOILWTICO': ('Oil Price', 'Crude Oil Prices: West Texas Intermediate'),
-            'UMCSENT': ('Consumer Sentiment', 'University of Michigan Consumer Sentiment'),
-            'HOUST': ('Housing Starts', 'Housing Starts'),
-            'INDPRO': ('Industrial Production', 'Industrial Production Index'),
-            'PAYEMS': ('Nonfarm Payrolls', 'All Employees: Total Nonfarm'),
-        }
-        
-        all_data = []
-        
-        for series_id, (short_name, full_name) in tqdm(indicators.items()):
-            try:
-                # Get data from 1980
-                data = self.fred.get_series(series_id, observation_start=start_date)
-                
-                if len(data) == 0:
-                    print(f"No data for {series_id}")
-                    continue
-                
-                # Create training text
-                text = self._create_economic_historical_text(
-                    series_id, short_name, full_name, data
-                )
-                
-                all_data.append({
-                    'series_id': series_id,
-                    'name': short_name,
-                    'full_name': full_name,
-                    'text': text,
-                    'years_of_data': (data.index[-1] - data.index[0]).days / 365,
-                    'start_date': data.index[0].strftime('%Y-%m-%d'),
-                    'end_date': data.index[-1].strftime('%Y-%m-%d'),
-                })
-                
-                time.sleep(0.5)
-                
-            except Exception as e:
-                print(f"Error collecting {series_id}: {e}")
-                continue
-        
-        return all_data
-    
-    def _create_historical_text(self, symbol, name, hist):
-        """Create comprehensive historical analysis text"""
-        
-        text_parts = []
-        
-        # Overview
-        text_parts.append(f"## {name} ({symbol}) - Historical Analysis")
-        text_parts.append(f"\n**Data Range**: {hist.index[0].strftime('%Y-%m-%d')} to {hist.index[-1].strftime('%Y-%m-%d')}")
-        text_parts.append(f"**Years of Data**: {len(hist) / 252:.1f} years")
-        
-        # Decade-by-decade analysis
-        text_parts.append(f"\n### Decade-by-Decade Performance")
-        
-        decades = [
-            ('1980s', '1980-01-01', '1989-12-31'),
-            ('1990s', '1990-01-01', '1999-12-31'),
-            ('2000s', '2000-01-01', '2009-12-31'),
-            ('2010s', '2010-01-01', '2019-12-31'),
-            ('2020s', '2020-01-01', '2029-12-31'),
-        ]
-        
-        for decade_name, start, end in decades:
-            decade_data = hist[(hist.index >= start) & (hist.index <= end)]
-            if len(decade_data) > 0:
-                start_price = decade_data['Close'].iloc[0]
-                end_price = decade_data['Close'].iloc[-1]
-                return_pct = ((end_price - start_price) / start_price * 100)
-                
-                text_parts.append(f"\n**{decade_name}**:")
-                text_parts.append(f"- Start: ${start_price:.2f}")
-                text_parts.append(f"- End: ${end_price:.2f}")
-                text_parts.append(f"- Return: {return_pct:+.2f}%")
-        
-        # Major events and crashes
-        text_parts.append(f"\n### Major Market Events")
-        
-        events = self._identify_major_events(hist)
-        for event in events:
-            text_parts.append(f"- **{event['date']}**: {event['description']}")
-        
-        # Long-term statistics
-        text_parts.append(f"\n### Long-term Statistics")
-        text_parts.append(f"- **All-Time High**: ${hist['High'].max():.2f} ({hist['High'].idxmax().strftime('%Y-%m-%d')})")
-        text_parts.append(f"- **All-Time Low**: ${hist['Low'].min():.2f} ({hist['Low'].idxmin().strftime('%Y-%m-%d')})")
-        text_parts.append(f"- **Average Price (40Y)**: ${hist['Close'].mean():.2f}")
-        text_parts.append(f"- **Total Return**: {((hist['Close'].iloc[-1] - hist['Close'].iloc[0]) / hist['Close'].iloc[0] * 100):+.2f}%")
-        text_parts.append(f"- **Annualized Return**: {(((hist['Close'].iloc[-1] / hist['Close'].iloc[0]) ** (1 / (len(hist) / 252))) - 1) * 100:.2f}%")
-        
-        return "\n".join(text_parts)
-    
-    def _create_economic_historical_text(self, series_id, short_name, full_name, data):
-        """Create economic indicator historical text"""
-        
-        text_parts = []
-        
-        text_parts.append(f"## {full_name} ({short_name})")
-        text_parts.append(f"\n**Series ID**: {series_id}")
-        text_parts.append(f"**Data Range**: {data.index[0].strftime('%Y-%m-%d')} to {data.index[-1].strftime('%Y-%m-%d')}")
-        text_parts.append(f"**Years of Data**: {(data.index[-1] - data.index[0]).days / 365:.1f} years")
-        
-        # Current vs Historical
-        text_parts.append(f"\n### Current vs Historical")
-        text_parts.append(f"- **Latest Value**: {data.iloc[-1]:.2f}")
-        text_parts.append(f"- **40-Year Average**: {data.mean():.2f}")
-        text_parts.append(f"- **40-Year High**: {data.max():.2f} ({data.idxmax().strftime('%Y-%m-%d')})")
-        text_parts.append(f"- **40-Year Low**: {data.min():.2f} ({data.idxmin().strftime('%Y-%m-%d')})")
-        
-        # Decade averages
-        text_parts.append(f"\n### Decade Averages")
-        
-        decades = [
-            ('1980s', '1980-01-01', '1989-12-31'),
-            ('1990s', '1990-01-01', '1999-12-31'),
-            ('2000s', '2000-01-01', '2009-12-31'),
-            ('2010s', '2010-01-01', '2019-12-31'),
-            ('2020s', '2020-01-01', '2029-12-31'),
-        ]
-        
-        for decade_name, start, end in decades:
-            decade_data = data[(data.index >= start) & (data.index <= end)]
-            if len(decade_data) > 0:
-                text_parts.append(f"- **{decade_name}**: {decade_data.mean():.2f}")
-        
-        return "\n".join(text_parts)
-    
-    def _identify_major_events(self, hist):
-        """Identify major market events (crashes, rallies)"""
-        events = []
-        
-        # Calculate daily returns
-        returns = hist['Close'].pct_change()
-        
-        # Find largest single-day drops
-        largest_drops = returns.nsmallest(5)
-        for date, ret in largest_drops.items():
-            if ret < -0.05:  # More than 5% drop
-                events.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'description': f"Major decline of {ret*100:.2f}%"
-                })
-        
-        # Find largest single-day gains
-        largest_gains = returns.nlargest(5)
-        for date, ret in largest_gains.items():
-            if ret > 0.05:  # More than 5% gain
-                events.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'description': f"Major rally of {ret*100:.2f}%"
-                })
-        
-        return sorted(events, key=lambda x: x['date'])
-    
-    def save_data(self, data, filename):
-        """Save collected data as JSONL"""
-        filepath = f"{self.output_dir}/{filename}"
-        with open(filepath, 'w') as f:
-            for item in data:
-                f.write(json.dumps(item) + '\n')
-        print(f"Saved {len(data)} items to {filepath}")
-
-if __name__ == "__main__":
-    # Get FRED API key
-    fred_api_key = "your_fred_api_key_here"  # Replace with your key
-    
-    collector = HistoricalDataCollector(fred_api_key)
-    
-    # Collect 40+ years of stock data
-    print("Collecting 40+ years of stock market data...")
-    stock_data = collector.collect_40_years_stock_data()
-    collector.save_data(stock_data, 'historical_stocks_40y.jsonl')
-    
-    # Collect 40+ years of economic data
-    print("Collecting 40+ years of economic data...")
-    economic_data = collector.collect_40_years_economic_data()
-    collector.save_data(economic_data, 'historical_economic_40y.jsonl')
-    
-    print("Historical data collection complete!")
-    print(f"Total stock datasets: {len(stock_data)}")
-    print(f"Total economic datasets: {len(economic_data)}")
+"""
+Enhanced Historical Data Collection (40+ Years)
+Collects comprehensive market and economic data dating back to 1980s
+"""
+
+import numpy as np
+from numba import njit
+import asyncio
+from datetime import datetime, timedelta
+import orjson
+import diskcache
+from tqdm import tqdm
+from pathlib import Path
+from fred_client import FredClient
+from collect_utils import batch_download, load_checkpoint, write_jsonl
+
+# Resume checkpoints are discarded (and everything re-collected) when any record in them was written
+# by a different record layout or is older than this, so re-runs pick up new prices and releases
+CHECKPOINT_VERSION = 1
+CHECKPOINT_MAX_AGE = timedelta(days=7)
+
+# Training text layouts, filled with a single str.format per series
+HISTORICAL_TEXT_TEMPLATE = """## {name} ({symbol}) - Historical Analysis
+
+**Data Range**: {first_date} to {last_date}
+**Years of Data**: {years:.1f} years
+
+### Decade-by-Decade Performance{decades_block}
+
+### Major Market Events{events_block}
+
+### Long-term Statistics
+- **All-Time High**: ${high:.2f} ({high_date})
+- **All-Time Low**: ${low:.2f} ({low_date})
+- **Average Price (40Y)**: ${mean:.2f}
+- **Total Return**: {total_return:+.2f}%
+- **Annualized Return**: {annualized_return:.2f}%"""
+
+ECONOMIC_HISTORICAL_TEXT_TEMPLATE = """## {full_name} ({short_name})
+
+**Series ID**: {series_id}
+**Data Range**: {first_date} to {last_date}
+**Years of Data**: {years:.1f} years
+
+### Current vs Historical
+- **Latest Value**: {latest:.2f}
+- **40-Year Average**: {mean:.2f}
+- **40-Year High**: {max:.2f} ({max_date})
+- **40-Year Low**: {min:.2f} ({min_date})
+
+### Decade Averages{decades_block}"""
+
+@njit(cache=True)
+def top_moves(close, k=5):
+    """One pass over closes keeping the k largest daily drops and gains (unused slots have index -1)"""
+    drop_val = np.zeros(k)
+    drop_idx = np.full(k, -1)
+    gain_val = np.zeros(k)
+    gain_idx = np.full(k, -1)
+    for i in range(1, close.shape[0]):
+        r = close[i] / close[i - 1] - 1.0
+        if not np.isfinite(r):
+            continue
+        j = np.argmax(drop_val)
+        if r < drop_val[j]:
+            drop_val[j] = r
+            drop_idx[j] = i
+        j = np.argmin(gain_val)
+        if r > gain_val[j]:
+            gain_val[j] = r
+            gain_idx[j] = i
+    return drop_val, drop_idx, gain_val, gain_idx
+
+@njit(cache=True)
+def reduce_all(high, low, close):
+    """High max/argmax, low min/argmin and close mean in one NaN-skipping pass"""
+    hmax, hmax_i = -np.inf, 0
+    lmin, lmin_i = np.inf, 0
+    csum, ccount = 0.0, 0
+    for i in range(close.shape[0]):
+        if high[i] > hmax:
+            hmax, hmax_i = high[i], i
+        if low[i] < lmin:
+            lmin, lmin_i = low[i], i
+        if not np.isnan(close[i]):
+            csum += close[i]
+            ccount += 1
+    return hmax, hmax_i, lmin, lmin_i, csum / ccount
+
+class HistoricalDataCollector(FredClient):
+    def __init__(self, fred_api_key, output_dir='./data/historical'):
+        self.fred_api_key = fred_api_key
+        self.output_dir = output_dir
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        # Persistent memo of raw API responses so re-runs skip the network
+        self.cache = diskcache.Cache(f'{output_dir}/.cache')
+    
+    def _record_meta(self):
+        """Checkpoint fields stamped on every streamed record"""
+        return {'version': CHECKPOINT_VERSION, 'collected_at': datetime.now().date().isoformat()}
+    
+    def collect_40_years_stock_data(self, filename='historical_stocks_40y.jsonl'):
+        """Collect 40+ years of stock market data, streaming each record to a resumable JSONL file;
+        returns the number of records in the file"""
+        print("Collecting 40+ years of stock market data...")
+        
+        # Calculate date range (40 years)
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=40*365)
+        
+        symbols_with_history = {
+            # US Indices (90+ years available)
+            '^GSPC': 'S&P 500',
+            '^DJI': 'Dow Jones Industrial Average',
+            '^IXIC': 'Nasdaq Composite',
+            
+            # Indian Indices
+            '^NSEI': 'Nifty 50',
+            '^BSESN': 'Sensex',
+            
+            # Major US Stocks (40+ years)
+            'AAPL': 'Apple Inc.',
+            'MSFT': 'Microsoft Corporation',
+            'IBM': 'IBM',
+            'GE': 'General Electric',
+            'JNJ': 'Johnson & Johnson',
+            'PG': 'Procter & Gamble',
+            'KO': 'Coca-Cola',
+            'XOM': 'Exxon Mobil',
+            'JPM': 'JPMorgan Chase',
+            'WMT': 'Walmart',
+            
+            # Indian Stocks (30+ years)
+            'RELIANCE.NS': 'Reliance Industries',
+            'TCS.NS': 'Tata Consultancy Services',
+            'HDFCBANK.NS': 'HDFC Bank',
+            'INFY.NS': 'Infosys',
+            'ITC.NS': 'ITC Limited',
+        }
+        
+        # Resume: symbols already in the output file are not fetched or rebuilt again
+        done = load_checkpoint(Path(self.output_dir) / filename, 'symbol', CHECKPOINT_VERSION, CHECKPOINT_MAX_AGE)
+        if done:
+            print(f"Resuming: {len(done)} symbols already collected")
+        written = len(done)
+        symbols_with_history = {s: n for s, n in symbols_with_history.items() if s not in done}
+        
+        # Histories are memoized on disk for 24h; only cache misses hit Yahoo
+        histories = batch_download(
+            list(symbols_with_history), cache=self.cache, cache_tag='yf40', start=start_date, end=end_date,
+        )
+        
+        with open(Path(self.output_dir) / filename, 'ab') as out:
+            for symbol, hist in tqdm((pair for batch in histories for pair in batch), total=len(symbols_with_history)):
+                try:
+                    name = symbols_with_history[symbol]
+                    
+                    if len(hist) == 0:
+                        print(f"No data for {symbol}")
+                        continue
+                    
+                    # Create comprehensive training text
+                    text = self._create_historical_text(symbol, name, hist)
+                    
+                    record = {
+                        'symbol': symbol,
+                        'name': name,
+                        'text': text,
+                        'years_of_data': len(hist) / 252,  # Trading days per year
+                        'start_date': hist.index[0].strftime('%Y-%m-%d'),
+                        'end_date': hist.index[-1].strftime('%Y-%m-%d'),
+                        **self._record_meta(),
+                    }
+                    out.write(orjson.dumps(record) + b'\n')
+                    out.flush()
+                    written += 1
+                    
+                except Exception as e:
+                    print(f"Error collecting {symbol}: {e}")
+                    continue
+        
+        return written
+    
+    async def collect_40_years_economic_data(self, filename='historical_economic_40y.jsonl'):
+        """Collect 40+ years of economic indicators (fetched concurrently, streamed to a resumable JSONL file);
+        returns the number of records in the file"""
+        print("Collecting 40+ years of economic data...")
+        
+        # Start from 1980 (44 years ago)
+        start_date = '1980-01-01'
+        
+        indicators = {
+            # US Economic Data
+            'GDP': ('GDP', 'Gross Domestic Product'),
+            'CPIAUCSL': ('CPI', 'Consumer Price Index (Inflation)'),
+            'UNRATE': ('Unemployment', 'Unemployment Rate'),
+            'DFF': ('Fed Funds Rate', 'Federal Funds Effective Rate'),
+            'DGS10': ('10Y Treasury', '10-Year Treasury Constant Maturity Rate'),
+            'DGS2': ('2Y Treasury', '2-Year Treasury Constant Maturity Rate'),
+            'DEXUSEU': ('USD/EUR', 'US Dollar to Euro Exchange Rate'),
+            'DEXJPUS': ('USD/JPY', 'US Dollar to Japanese Yen'),
+            'DEXINUS': ('USD/INR', 'US Dollar to Indian Rupee'),
+            'GOLDAMGBD228NLBM': ('Gold Price', 'Gold Fixing Price'),
+            'DCOILWTICO': ('Oil Price', 'Crude Oil Prices: West Texas Intermediate'),
+            'UMCSENT': ('Consumer Sentiment', 'University of Michigan Consumer Sentiment'),
+            'HOUST': ('Housing Starts', 'Housing Starts'),
+            'INDPRO': ('Industrial Production', 'Industrial Production Index'),
+            'PAYEMS': ('Nonfarm Payrolls', 'All Employees: Total Nonfarm'),
+        }
+        
+        # Resume: series already in the output file are not fetched or rebuilt again
+        done = load_checkpoint(Path(self.output_dir) / filename, 'series_id', CHECKPOINT_VERSION, CHECKPOINT_MAX_AGE)
+        if done:
+            print(f"Resuming: {len(done)} series already collected")
+        written = len(done)
+        indicators = {s: names for s, names in indicators.items() if s not in done}
+        
+        # Get data from 1980
+        results = await asyncio.gather(
+            *(self._get_series_cached(series_id, observation_start=start_date) for series_id in indicators),
+            return_exceptions=True,
+        )
+        
+        with open(Path(self.output_dir) / filename, 'ab') as out:
+            for (series_id, (short_name, full_name)), data in zip(tqdm(indicators.items()), results):
+                try:
+                    if isinstance(data, Exception):
+                        raise data
+                    
+                    if len(data) == 0:
+                        print(f"No data for {series_id}")
+                        continue
+                    
+                    # Create training text
+                    text = self._create_economic_historical_text(
+                        series_id, short_name, full_name, data
+                    )
+                    
+                    record = {
+                        'series_id': series_id,
+                        'name': short_name,
+                        'full_name': full_name,
+                        'text': text,
+                        'years_of_data': (data.index[-1] - data.index[0]).days / 365,
+                        'start_date': data.index[0].strftime('%Y-%m-%d'),
+                        'end_date': data.index[-1].strftime('%Y-%m-%d'),
+                        **self._record_meta(),
+                    }
+                    out.write(orjson.dumps(record) + b'\n')
+                    out.flush()
+                    written += 1
+                    
+                except Exception as e:
+                    print(f"Error collecting {series_id}: {e}")
+                    continue
+        
+        return written
+    
+    def _create_historical_text(self, symbol, name, hist):
+        """Create comprehensive historical analysis text"""
+        
+        closes = hist['Close']
+        close_arr = closes.to_numpy(dtype=np.float64)
+        high, high_pos, low, low_pos, mean = reduce_all(
+            hist['High'].to_numpy(dtype=np.float64), hist['Low'].to_numpy(dtype=np.float64), close_arr
+        )
+        
+        # Every date this text mentions, formatted in one vectorized strftime call
+        first_date, last_date, high_date, low_date = hist.index[[0, -1, high_pos, low_pos]].strftime('%Y-%m-%d')
+        
+        # Decade-by-decade analysis (one groupby pass instead of a mask per decade)
+        decade_key = (hist.index.year // 10) * 10
+        first_last = closes.groupby(decade_key).agg(['first', 'last']).loc[1980:2020]
+        returns = (first_last['last'] - first_last['first']) / first_last['first'] * 100
+        decades_block = "".join(
+            f"\n\n**{decade}s**:\n- Start: ${start_price:.2f}\n- End: ${end_price:.2f}\n- Return: {return_pct:+.2f}%"
+            for decade, start_price, end_price, return_pct in zip(first_last.index, first_last['first'], first_last['last'], returns)
+        )
+        
+        # Major events and crashes
+        events_block = "".join(
+            f"\n- **{event['date']}**: {event['description']}" for event in self._identify_major_events(hist)
+        )
+        
+        return HISTORICAL_TEXT_TEMPLATE.format(
+            name=name,
+            symbol=symbol,
+            first_date=first_date,
+            last_date=last_date,
+            years=len(hist) / 252,
+            decades_block=decades_block,
+            events_block=events_block,
+            high=high,
+            high_date=high_date,
+            low=low,
+            low_date=low_date,
+            mean=mean,
+            total_return=(close_arr[-1] - close_arr[0]) / close_arr[0] * 100,
+            annualized_return=(((close_arr[-1] / close_arr[0]) ** (1 / (len(hist) / 252))) - 1) * 100,
+        )
+    
+    def _create_economic_historical_text(self, series_id, short_name, full_name, data):
+        """Create economic indicator historical text"""
+        
+        first_date, last_date = data.index[[0, -1]].strftime('%Y-%m-%d')
+        
+        # Decade averages (one groupby pass instead of a mask per decade)
+        decade_means = data.groupby((data.index.year // 10) * 10).mean().loc[1980:2020]
+        decades_block = "".join(f"\n- **{decade}s**: {mean:.2f}" for decade, mean in decade_means.items())
+        
+        return ECONOMIC_HISTORICAL_TEXT_TEMPLATE.format(
+            full_name=full_name,
+            short_name=short_name,
+            series_id=series_id,
+            first_date=first_date,
+            last_date=last_date,
+            years=(data.index[-1] - data.index[0]).days / 365,
+            latest=data.to_numpy()[-1],
+            decades_block=decades_block,
+            **self._series_stats(series_id, data),
+        )
+    
+    def _identify_major_events(self, hist):
+        """Identify major market events (crashes, rallies)"""
+        events = []
+        
+        # Largest single-day drops and gains in one compiled pass over the closes
+        drop_val, drop_idx, gain_val, gain_idx = top_moves(hist['Close'].to_numpy(dtype=np.float64))
+        
+        drops = drop_val < -0.05  # More than 5% drop
+        gains = gain_val > 0.05  # More than 5% gain
+        date_strs = hist.index[np.concatenate([drop_idx[drops], gain_idx[gains]])].strftime('%Y-%m-%d')
+        n_drops = drops.sum()
+        
+        for date, ret in zip(date_strs[:n_drops], drop_val[drops]):
+            events.append({
+                'date': date,
+                'description': f"Major decline of {ret*100:.2f}%"
+            })
+        
+        for date, ret in zip(date_strs[n_drops:], gain_val[gains]):
+            events.append({
+                'date': date,
+                'description': f"Major rally of {ret*100:.2f}%"
+            })
+        
+        return sorted(events, key=lambda x: x['date'])
+    
+    def save_data(self, data, filename):
+        """Save collected data as JSONL"""
+        filepath = Path(self.output_dir) / filename
+        count = write_jsonl(filepath, data)
+        print(f"Saved {count} items to {filepath}")
+
+if __name__ == "__main__":
+    # Get FRED API key
+    fred_api_key = "your_fred_api_key_here"  # Replace with your key
+    
+    collector = HistoricalDataCollector(fred_api_key)
+    
+    # Collect 40+ years of stock data
+    print("Collecting 40+ years of stock market data...")
+    # Records are streamed to data/historical as they are built; re-running resumes
+    stock_count = collector.collect_40_years_stock_data()
+    
+    # Collect 40+ years of economic data
+    print("Collecting 40+ years of economic data...")
+    async def collect_economic():
+        async with collector:
+            return await collector.collect_40_years_economic_data()
+    
+    economic_count = asyncio.run(collect_economic())
+    
+    print("Historical data collection complete!")
+    print(f"Total stock datasets: {stock_count}")
+    print(f"Total economic datasets: {economic_count}")
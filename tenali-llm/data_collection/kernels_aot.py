@@ -0,0 +1,21 @@
+"""
+Ahead-of-time build of the technical-pattern kernels
+Run once per environment: `python kernels_aot.py` writes the tapatterns_cc extension next
+to this file, and technical_patterns.py imports it instead of JIT-compiling tenali_kernels
+"""
+
+from pathlib import Path
+from numba.pycc import CC
+
+from tenali_kernels import candlestick_bits, latest_indicators, smc_scan
+
+cc = CC('tapatterns_cc')
+cc.output_dir = str(Path(__file__).parent)
+
+# Rows of the C-contiguous (5, n) OHLCV block are contiguous, hence the [::1] layouts
+cc.export('candlestick_bits', 'int64(f8[::1], f8[::1], f8[::1], f8[::1])')(candlestick_bits.py_func)
+cc.export('latest_indicators', 'UniTuple(f8, 9)(f8[::1])')(latest_indicators.py_func)
+cc.export('smc_scan', 'Tuple((b1[::1], b1[::1], b1[::1], b1[::1], i8))(f8[::1], f8[::1], f8[::1], f8[::1])')(smc_scan.py_func)
+
+if __name__ == "__main__":
+    cc.compile()
@@ -1,170 +1,200 @@
-"""
-News and Financial Filings Collection
-Collects: SEC filings, BSE/NSE announcements, financial news
-"""
-
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-from datetime import datetime, timedelta
-import json
-from tqdm import tqdm
-import time
-
-import os
-
-class NewsFilingsCollector:
-    def __init__(self, output_dir='./data/news'):
-        self.output_dir = output_dir
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-    def collect_sec_filings(self, ciks, filing_types=['10-K', '10-Q', '8-K']):
-        """Collect SEC EDGAR filings"""
-        print(f"Collecting SEC filings for {len(ciks)} companies...")
-        
-        all_filings = []
-        
-        for cik in tqdm(ciks):
-            for filing_type in filing_types:
-                try:
-                    # SEC EDGAR API
-                    url = f"https://www.sec.gov/cgi-bin/browse-edgar"
-                    params = {
-                        'action': 'getcompany',
-                        'CIK': cik,
-                        'type': filing_type,
-                        'dateb': '',
-                        'owner': 'exclude',
-                        'count': 10,
-                    }
-                    
-                    headers = {
-                        'User-Agent': 'Mozilla/5.0'
-                    }
-                    
-                    response = requests.get(url, params=params, headers=headers)
-                    
-                    # Parse filing information
-                    # (Simplified - in production, download and parse actual filings)
-                    
-                    filing_text = f"""## SEC Filing: {filing_type} for CIK {cik}
-
-### Filing Type: {filing_type}
-
-**{filing_type} Filings:**
-- **10-K**: Annual report with comprehensive financial information
-- **10-Q**: Quarterly report with unaudited financial statements
-- **8-K**: Current report for material events
-
-### Key Sections:
-- Business Overview
-- Risk Factors
-- Financial Statements
-- Management Discussion & Analysis (MD&A)
-- Notes to Financial Statements
-
-*SEC filings provide detailed financial and operational information for public companies.*
-"""
-                    
-                    all_filings.append({
-                        'cik': cik,
-                        'filing_type': filing_type,
-                        'text': filing_text,
-                    })
-                    
-                    time.sleep(0.5)  # Rate limiting
-                    
-                except Exception as e:
-                    print(f"Error collecting {filing_type} for {cik}: {e}")
-                    continue
-        
-        return all_filings
-    
-    def get_nse_tickers(self):
-        """Fetch all active NSE equity symbols"""
-        print("Fetching NSE ticker list...")
-        tickers = []
-        try:
-            # Official NSE Archives
-            url = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                df = pd.read_csv(io.StringIO(response.text))
-                tickers = [f"{x}.NS" for x in df['SYMBOL'].tolist()]
-        except Exception as e:
-            print(f"Error fetching NSE list: {e}")
-            tickers = ["RELIANCE.NS", "TCS.NS"]
-        return list(set(tickers))
-
-    def collect_financial_news(self, symbols):
-        """Collect financial news articles using yfinance"""
-        print(f"Collecting news for {len(symbols)} companies...")
-        
-        news_articles = []
-        
-        for symbol in tqdm(symbols):
-            try:
-                ticker = yf.Ticker(symbol)
-                news = ticker.news
-                
-                if not news:
-                    continue
-                    
-                for article in news:
-                    title = article.get('title', '')
-                    link = article.get('link', '')
-                    publisher = article.get('publisher', '')
-                    pub_date = datetime.fromtimestamp(article.get('providerPublishTime', 0)).strftime('%Y-%m-%d')
-                    
-                    text = f"""## News: {title}
-                    
-**Symbol**: {symbol}
-**Date**: {pub_date}
-**Source**: {publisher}
-
-**Summary**:
-{title}
-
-*Read more at: {link}*
-"""
-                    news_articles.append({
-                        'symbol': symbol,
-                        'title': title,
-                        'date': pub_date,
-                        'text': text,
-                        'link': link
-                    })
-                    
-            except Exception as e:
-                # print(f"Error fetching news for {symbol}: {e}")
-                continue
-        
-        return news_articles
-    
-    def save_data(self, data, filename):
-        """Save collected data as JSONL"""
-        filepath = f"{self.output_dir}/{filename}"
-        with open(filepath, 'w') as f:
-            for item in data:
-                f.write(json.dumps(item) + '\n')
-        print(f"Saved {len(data)} items to {filepath}")
-
-if __name__ == "__main__":
-    import yfinance as yf
-    import io
-    
-    collector = NewsFilingsCollector()
-    
-    # Get full NSE list
-    print("Fetching full NSE ticker list...")
-    nse_tickers = collector.get_nse_tickers()
-    print(f"Found {len(nse_tickers)} NSE stocks.")
-    
-    # Collect news
-    print("Collecting financial news...")
-    news = collector.collect_financial_news(nse_tickers)
-    collector.save_data(news, 'financial_news.jsonl')
-    
-    print("News collection complete!")
+"""
+News and Financial Filings Collection
+Collects: SEC filings, BSE/NSE announcements, financial news
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import httpx
+import asyncio
+from aiolimiter import AsyncLimiter
+import yfinance as yf
+import io
+from bs4 import BeautifulSoup
+import pandas as pd
+from datetime import datetime, timedelta
+import json
+from tqdm.asyncio import tqdm_asyncio
+
+import os
+
+SEC_BROWSE_URL = "https://www.sec.gov/cgi-bin/browse-edgar"
+
+class NewsFilingsCollector:
+    def __init__(self, output_dir='./data/news'):
+        self.output_dir = output_dir
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        # Pooled keep-alive session with retries for the blocking downloads
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': 'Mozilla/5.0'})
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=32, pool_maxsize=32,
+            max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+        ))
+        
+    async def acollect_sec_filings(self, ciks, filing_types=['10-K', '10-Q', '8-K'], concurrency=20):
+        """Collect SEC EDGAR filings; requests overlap, throttled to SEC's 10 requests/second"""
+        print(f"Collecting SEC filings for {len(ciks)} companies...")
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        limiter = AsyncLimiter(10, 1)
+        jobs = [(cik, filing_type) for cik in ciks for filing_type in filing_types]
+        
+        async with httpx.AsyncClient(
+            headers={'User-Agent': 'Mozilla/5.0'},
+            timeout=30,
+            limits=httpx.Limits(max_connections=concurrency),
+        ) as client:
+            async def fetch(cik, filing_type):
+                params = {
+                    'action': 'getcompany',
+                    'CIK': cik,
+                    'type': filing_type,
+                    'dateb': '',
+                    'owner': 'exclude',
+                    'count': 10,
+                }
+                try:
+                    async with semaphore, limiter:
+                        return await client.get(SEC_BROWSE_URL, params=params)
+                except Exception as e:
+                    return e
+            
+            responses = await tqdm_asyncio.gather(*(fetch(cik, filing_type) for cik, filing_type in jobs))
+        
+        all_filings = []
+        
+        for (cik, filing_type), response in zip(jobs, responses):
+            if isinstance(response, Exception):
+                print(f"Error collecting {filing_type} for {cik}: {response}")
+                continue
+            
+            # Parse filing information
+            # (Simplified - in production, download and parse actual filings)
+            
+            filing_text = f"""## SEC Filing: {filing_type} for CIK {cik}
+
+### Filing Type: {filing_type}
+
+**{filing_type} Filings:**
+- **10-K**: Annual report with comprehensive financial information
+- **10-Q**: Quarterly report with unaudited financial statements
+- **8-K**: Current report for material events
+
+### Key Sections:
+- Business Overview
+- Risk Factors
+- Financial Statements
+- Management Discussion & Analysis (MD&A)
+- Notes to Financial Statements
+
+*SEC filings provide detailed financial and operational information for public companies.*
+"""
+            
+            all_filings.append({
+                'cik': cik,
+                'filing_type': filing_type,
+                'text': filing_text,
+            })
+        
+        return all_filings
+    
+    def collect_sec_filings(self, ciks, filing_types=['10-K', '10-Q', '8-K']):
+        """Collect SEC EDGAR filings"""
+        return asyncio.run(self.acollect_sec_filings(ciks, filing_types))
+    
+    def get_nse_tickers(self):
+        """Fetch all active NSE equity symbols"""
+        print("Fetching NSE ticker list...")
+        tickers = []
+        try:
+            # Official NSE Archives
+            url = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
+            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
+            response = self.session.get(url, headers=headers, timeout=10)
+            if response.status_code == 200:
+                df = pd.read_csv(io.StringIO(response.text))
+                tickers = [f"{x}.NS" for x in df['SYMBOL'].tolist()]
+        except Exception as e:
+            print(f"Error fetching NSE list: {e}")
+            tickers = ["RELIANCE.NS", "TCS.NS"]
+        return list(dict.fromkeys(tickers))
+
+    async def acollect_financial_news(self, symbols, concurrency=20):
+        """Collect financial news articles using yfinance, overlapping the per-symbol requests"""
+        print(f"Collecting news for {len(symbols)} companies...")
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch(symbol):
+            # yfinance is blocking; run it on a worker thread
+            try:
+                async with semaphore:
+                    return await asyncio.to_thread(lambda: yf.Ticker(symbol).news)
+            except Exception as e:
+                # print(f"Error fetching news for {symbol}: {e}")
+                return None
+        
+        results = await tqdm_asyncio.gather(*(fetch(symbol) for symbol in symbols))
+        
+        news_articles = []
+        
+        for symbol, news in zip(symbols, results):
+            if not news:
+                continue
+                
+            for article in news:
+                title = article.get('title', '')
+                link = article.get('link', '')
+                publisher = article.get('publisher', '')
+                pub_date = datetime.fromtimestamp(article.get('providerPublishTime', 0)).strftime('%Y-%m-%d')
+                
+                text = f"""## News: {title}
+                    
+**Symbol**: {symbol}
+**Date**: {pub_date}
+**Source**: {publisher}
+
+**Summary**:
+{title}
+
+*Read more at: {link}*
+"""
+                news_articles.append({
+                    'symbol': symbol,
+                    'title': title,
+                    'date': pub_date,
+                    'text': text,
+                    'link': link
+                })
+        
+        return news_articles
+    
+    def collect_financial_news(self, symbols):
+        """Collect financial news articles using yfinance"""
+        return asyncio.run(self.acollect_financial_news(symbols))
+    
+    def save_data(self, data, filename):
+        """Save collected data as JSONL"""
+        filepath = f"{self.output_dir}/{filename}"
+        with open(filepath, 'w') as f:
+            for item in data:
+                f.write(json.dumps(item) + '\n')
+        print(f"Saved {len(data)} items to {filepath}")
+
+if __name__ == "__main__":
+    collector = NewsFilingsCollector()
+    
+    # Get full NSE list
+    print("Fetching full NSE ticker list...")
+    nse_tickers = collector.get_nse_tickers()
+    print(f"Found {len(nse_tickers)} NSE stocks.")
+    
+    # Collect news
+    print("Collecting financial news...")
+    news = collector.collect_financial_news(nse_tickers)
+    collector.save_data(news, 'financial_news.jsonl')
+    
+    print("News collection complete!")
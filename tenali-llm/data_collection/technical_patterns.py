@@ -1,426 +1,467 @@
-"""
-Technical Analysis & Smart Money Concepts Data Collection
-Generates training data for TA patterns, indicators, and SMC concepts
-"""
-
-import yfinance as yf
-import pandas as pd
-import numpy as np
-import os
-from datetime import datetime, timedelta
-import json
-from tqdm import tqdm
-
-class TechnicalPatternsCollector:
-    def __init__(self, output_dir='./data/technical'):
-        self.output_dir = output_dir
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-    def collect_technical_data(self, symbols, years=5):
-        """Collect price data and generate TA/SMC training examples"""
-        print(f"Generating technical analysis data for {len(symbols)} symbols...")
-        
-        all_data = []
-        
-        for symbol in tqdm(symbols):
-            try:
-                # Get historical data
-                ticker = yf.Ticker(symbol)
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=years*365)
-                df = ticker.history(start=start_date, end=end_date)
-                
-                if len(df) < 200:
-                    continue
-                
-                # Generate TA examples
-                ta_examples = self._generate_ta_examples(symbol, df)
-                
-                # Generate SMC examples
-                smc_examples = self._generate_smc_examples(symbol, df)
-                
-                # Generate Fundamental examples
-                fund_examples = self._generate_fundamental_examples(symbol, ticker.info)
-                
-                all_data.extend(ta_examples)
-                all_data.extend(smc_examples)
-                all_data.extend(fund_examples)
-                
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
-                continue
-        
-        return all_data
-    
-    def _generate_ta_examples(self, symbol, df):
-        """Generate technical analysis training examples using pure Pandas"""
-        examples = []
-        
-        # Calculate indicators using Pandas
-        close = df['Close']
-        
-        # SMA
-        df['SMA_50'] = close.rolling(window=50).mean()
-        df['SMA_200'] = close.rolling(window=200).mean()
-        
-        # RSI
-        delta = close.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        # MACD
-        exp1 = close.ewm(span=12, adjust=False).mean()
-        exp2 = close.ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['MACD_signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        df['MACD_hist'] = df['MACD'] - df['MACD_signal']
-        
-        # Bollinger Bands
-        df['BB_middle'] = close.rolling(window=20).mean()
-        df['BB_std'] = close.rolling(window=20).std()
-        df['BB_upper'] = df['BB_middle'] + (df['BB_std'] * 2)
-        df['BB_lower'] = df['BB_middle'] - (df['BB_std'] * 2)
-        
-        # Get latest values
-        latest = df.iloc[-1]
-        
-        # Example 1: Trend Analysis
-        trend_text = f"""## Technical Analysis: {symbol}
-
-### Trend Analysis
-- **Current Price**: ${latest['Close']:.2f}
-- **50-Day SMA**: ${latest['SMA_50']:.2f}
-- **200-Day SMA**: ${latest['SMA_200']:.2f}
-- **Trend**: {'Bullish' if latest['Close'] > latest['SMA_200'] else 'Bearish'}
-- **Golden Cross**: {'Yes' if latest['SMA_50'] > latest['SMA_200'] else 'No'}
-
-### Momentum Indicators
-- **RSI (14)**: {latest['RSI']:.2f} - {'Overbought' if latest['RSI'] > 70 else 'Oversold' if latest['RSI'] < 30 else 'Neutral'}
-- **MACD**: {latest['MACD']:.2f}
-- **MACD Signal**: {latest['MACD_signal']:.2f}
-- **MACD Histogram**: {latest['MACD_hist']:.2f} - {'Bullish' if latest['MACD_hist'] > 0 else 'Bearish'}
-
-### Bollinger Bands
-- **Upper Band**: ${latest['BB_upper']:.2f}
-- **Middle Band**: ${latest['BB_middle']:.2f}
-- **Lower Band**: ${latest['BB_lower']:.2f}
-- **Position**: {'Near upper band (overbought)' if latest['Close'] > latest['BB_upper'] * 0.98 else 'Near lower band (oversold)' if latest['Close'] < latest['BB_lower'] * 1.02 else 'Within bands'}
-
-### Key Levels
-- **52-Week High**: ${df['High'].tail(252).max():.2f}
-- **52-Week Low**: ${df['Low'].tail(252).min():.2f}
-- **Support**: ${df['Low'].tail(20).min():.2f}
-- **Resistance**: ${df['High'].tail(20).max():.2f}
-
-*This analysis is for educational purposes only and not investment advice.*
-"""
-        
-        examples.append({
-            'symbol': symbol,
-            'type': 'technical_analysis',
-            'text': trend_text,
-        })
-        
-        # Example 2: Candlestick Patterns
-        patterns = self._identify_candlestick_patterns(df)
-        if patterns:
-            pattern_text = f"""## Candlestick Patterns: {symbol}
-
-### Detected Patterns
-{chr(10).join([f"- **{p['name']}**: {p['description']}" for p in patterns])}
-
-### Interpretation
-Candlestick patterns provide insights into market psychology and potential reversals.
-Traders often use these patterns in conjunction with other technical indicators for confirmation.
-
-*This analysis is for educational purposes only and not investment advice.*
-"""
-            examples.append({
-                'symbol': symbol,
-                'type': 'candlestick_patterns',
-                'text': pattern_text,
-            })
-        
-        return examples
-    
-    def _generate_smc_examples(self, symbol, df):
-        """Generate Smart Money Concepts training examples"""
-        examples = []
-        
-        # Identify Order Blocks
-        order_blocks = self._identify_order_blocks(df)
-        
-        # Identify Fair Value Gaps
-        fvgs = self._identify_fair_value_gaps(df)
-        
-        # Identify BOS/CHOCH
-        structure_breaks = self._identify_structure_breaks(df)
-        
-        smc_text = f"""## Smart Money Concepts (SMC) Analysis: {symbol}
-
-### Order Blocks (OB)
-Order blocks are areas where institutional traders (smart money) have placed significant orders.
-
-**Bullish Order Blocks:**
-{chr(10).join([f"- ${ob['low']:.2f} - ${ob['high']:.2f} (Date: {ob['date']})" for ob in order_blocks['bullish'][:3]]) if order_blocks['bullish'] else '- None detected'}
-
-**Bearish Order Blocks:**
-{chr(10).join([f"- ${ob['low']:.2f} - ${ob['high']:.2f} (Date: {ob['date']})" for ob in order_blocks['bearish'][:3]]) if order_blocks['bearish'] else '- None detected'}
-
-### Fair Value Gaps (FVG)
-FVGs are imbalances in price action where the market moves quickly, leaving gaps to be filled.
-
-**Identified FVGs:**
-{chr(10).join([f"- ${fvg['low']:.2f} - ${fvg['high']:.2f} ({'Filled' if fvg['filled'] else 'Unfilled'})" for fvg in fvgs[:5]]) if fvgs else '- None detected'}
-
-### Market Structure
-**Break of Structure (BOS):** {structure_breaks['bos_count']} detected
-**Change of Character (CHOCH):** {structure_breaks['choch_count']} detected
-
-**Current Trend:** {structure_breaks['trend']}
-
-### Liquidity Zones
-- **Buy-Side Liquidity**: Above ${df['High'].tail(20).max():.2f}
-- **Sell-Side Liquidity**: Below ${df['Low'].tail(20).min():.2f}
-
-### Premium/Discount Zones
-- **Premium Zone**: Above ${df['Close'].tail(50).mean():.2f} (selling opportunity)
-- **Discount Zone**: Below ${df['Close'].tail(50).mean():.2f} (buying opportunity)
-
-*This analysis is for educational purposes only and not investment advice.*
-"""
-        
-        examples.append({
-            'symbol': symbol,
-            'type': 'smc_analysis',
-            'text': smc_text,
-        })
-        
-        return examples
-    
-    def _identify_candlestick_patterns(self, df):
-        """Identify candlestick patterns using pure Python (simplified)"""
-        patterns = []
-        
-        # Get last candle
-        curr = df.iloc[-1]
-        prev = df.iloc[-2]
-        
-        # Calculate candle properties
-        body_size = abs(curr['Close'] - curr['Open'])
-        upper_shadow = curr['High'] - max(curr['Close'], curr['Open'])
-        lower_shadow = min(curr['Close'], curr['Open']) - curr['Low']
-        
-        # 1. Doji (Body is very small)
-        if body_size <= (curr['High'] - curr['Low']) * 0.1:
-            patterns.append({'name': 'Doji', 'description': 'Indecision in the market'})
-            
-        # 2. Hammer (Small body, long lower shadow)
-        if lower_shadow > body_size * 2 and upper_shadow < body_size * 0.5:
-            patterns.append({'name': 'Hammer', 'description': 'Potential bullish reversal'})
-            
-        # 3. Shooting Star (Small body, long upper shadow)
-        if upper_shadow > body_size * 2 and lower_shadow < body_size * 0.5:
-            patterns.append({'name': 'Shooting Star', 'description': 'Potential bearish reversal'})
-            
-        # 4. Bullish Engulfing
-        if (curr['Close'] > curr['Open'] and prev['Close'] < prev['Open'] and
-            curr['Close'] > prev['Open'] and curr['Open'] < prev['Close']):
-            patterns.append({'name': 'Bullish Engulfing', 'description': 'Strong bullish reversal signal'})
-            
-        # 5. Bearish Engulfing
-        if (curr['Close'] < curr['Open'] and prev['Close'] > prev['Open'] and
-            curr['Close'] < prev['Open'] and curr['Open'] > prev['Close']):
-            patterns.append({'name': 'Bearish Engulfing', 'description': 'Strong bearish reversal signal'})
-            
-        return patterns
-    
-    def _identify_order_blocks(self, df):
-        """Identify order blocks (simplified logic)"""
-        bullish_obs = []
-        bearish_obs = []
-        
-        # Look for strong moves preceded by consolidation
-        for i in range(20, len(df) - 1):
-            # Bullish OB: Strong up move after down candle
-            if (df['Close'].iloc[i] > df['Open'].iloc[i] and
-                df['Close'].iloc[i] - df['Open'].iloc[i] > df['Close'].iloc[i] * 0.02 and
-                df['Close'].iloc[i-1] < df['Open'].iloc[i-1]):
-                
-                bullish_obs.append({
-                    'low': df['Low'].iloc[i-1],
-                    'high': df['High'].iloc[i-1],
-                    'date': df.index[i-1].strftime('%Y-%m-%d'),
-                })
-            
-            # Bearish OB: Strong down move after up candle
-            if (df['Close'].iloc[i] < df['Open'].iloc[i] and
-                df['Open'].iloc[i] - df['Close'].iloc[i] > df['Close'].iloc[i] * 0.02 and
-                df['Close'].iloc[i-1] > df['Open'].iloc[i-1]):
-                
-                bearish_obs.append({
-                    'low': df['Low'].iloc[i-1],
-                    'high': df['High'].iloc[i-1],
-                    'date': df.index[i-1].strftime('%Y-%m-%d'),
-                })
-        
-        return {'bullish': bullish_obs[-10:], 'bearish': bearish_obs[-10:]}
-    
-    def _identify_fair_value_gaps(self, df):
-        """Identify fair value gaps"""
-        fvgs = []
-        
-        for i in range(2, len(df)):
-            # Bullish FVG: Gap between candle 1 high and candle 3 low
-            if df['Low'].iloc[i] > df['High'].iloc[i-2]:
-                fvgs.append({
-                    'low': df['High'].iloc[i-2],
-                    'high': df['Low'].iloc[i],
-                    'type': 'bullish',
-                    'filled': df['Low'].iloc[i:].min() <= df['High'].iloc[i-2],
-                })
-            
-            # Bearish FVG: Gap between candle 1 low and candle 3 high
-            if df['High'].iloc[i] < df['Low'].iloc[i-2]:
-                fvgs.append({
-                    'low': df['High'].iloc[i],
-                    'high': df['Low'].iloc[i-2],
-                    'type': 'bearish',
-                    'filled': df['High'].iloc[i:].max() >= df['Low'].iloc[i-2],
-                })
-        
-        return fvgs[-20:]
-    
-    def _identify_structure_breaks(self, df):
-        """Identify BOS and CHOCH (simplified)"""
-        highs = df['High'].rolling(20).max()
-        lows = df['Low'].rolling(20).min()
-        
-        bos_count = 0
-        choch_count = 0
-        
-        for i in range(20, len(df)):
-            # BOS: Price breaks previous high/low in trend direction
-            if df['Close'].iloc[i] > highs.iloc[i-1]:
-                bos_count += 1
-            elif df['Close'].iloc[i] < lows.iloc[i-1]:
-                bos_count += 1
-        
-        # Determine trend
-        if df['Close'].iloc[-1] > df['Close'].iloc[-50]:
-            trend = 'Bullish'
-        else:
-            trend = 'Bearish'
-        
-        return {
-            'bos_count': bos_count,
-            'choch_count': choch_count,
-            'trend': trend,
-        }
-    
-    def save_data(self, data, filename):
-        """Save collected data as JSONL"""
-        filepath = f"{self.output_dir}/{filename}"
-        with open(filepath, 'w') as f:
-            for item in data:
-                f.write(json.dumps(item) + '\n')
-        print(f"Saved {len(data)} items to {filepath}")
-
-    def get_nse_tickers(self):
-        """Fetch all active NSE equity symbols"""
-        print("Fetching NSE ticker list...")
-        tickers = []
-        try:
-            # Official NSE Archives
-            url = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                df = pd.read_csv(io.StringIO(response.text))
-                tickers = [f"{x}.NS" for x in df['SYMBOL'].tolist()]
-        except Exception as e:
-            print(f"Error fetching NSE list: {e}")
-            # Fallback
-            tickers = ["RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "INFY.NS", "ICICIBANK.NS"]
-            
-        return list(set(tickers))
-
-    def _generate_fundamental_examples(self, symbol, info):
-        """Generate fundamental analysis training examples"""
-        if not info:
-            return []
-            
-        examples = []
-        
-        # Extract metrics with safe defaults
-        pe = info.get('trailingPE', 'N/A')
-        forward_pe = info.get('forwardPE', 'N/A')
-        pb = info.get('priceToBook', 'N/A')
-        roe = info.get('returnOnEquity', 'N/A')
-        debt_equity = info.get('debtToEquity', 'N/A')
-        profit_margin = info.get('profitMargins', 'N/A')
-        sector = info.get('sector', 'Unknown')
-        industry = info.get('industry', 'Unknown')
-        market_cap = info.get('marketCap', 0)
-        
-        # Format values
-        roe_str = f"{roe*100:.2f}%" if isinstance(roe, (int, float)) else roe
-        margin_str = f"{profit_margin*100:.2f}%" if isinstance(profit_margin, (int, float)) else profit_margin
-        mcap_str = f"${market_cap/1e9:.2f}B" if isinstance(market_cap, (int, float)) else "N/A"
-
-        text = f"""## Fundamental Analysis: {symbol}
-
-### Company Profile
-- **Sector**: {sector}
-- **Industry**: {industry}
-- **Market Cap**: {mcap_str}
-
-### Valuation Metrics
-- **P/E Ratio**: {pe} (Forward: {forward_pe})
-- **P/B Ratio**: {pb}
-- **Valuation Status**: {'Undervalued' if isinstance(pe, (int, float)) and pe < 15 else 'Overvalued' if isinstance(pe, (int, float)) and pe > 30 else 'Fairly Valued'}
-
-### Profitability & Health
-- **ROE**: {roe_str}
-- **Profit Margin**: {margin_str}
-- **Debt/Equity**: {debt_equity}
-
-### Investment Thesis
-Based on current metrics, {symbol} shows {'strong' if isinstance(roe, (int, float)) and roe > 0.15 else 'moderate'} profitability.
-The company operates in the {industry} industry.
-
-*This analysis is based on historical data and is not investment advice.*
-"""
-        examples.append({
-            'symbol': symbol,
-            'type': 'fundamental_analysis',
-            'text': text
-        })
-        
-        return examples
-
-if __name__ == "__main__":
-    import requests
-    import io
-    
-    collector = TechnicalPatternsCollector()
-    
-    # Get full NSE list
-    print("Fetching full NSE ticker list...")
-    nse_tickers = collector.get_nse_tickers()
-    print(f"Found {len(nse_tickers)} NSE stocks.")
-    
-    # Also add some US tech giants for variety
-    us_tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'TSLA', 'META']
-    all_tickers = nse_tickers + us_tickers
-    
-    print(f"Starting analysis for {len(all_tickers)} companies...")
-    print("Note: This will take time. Progress is saved automatically.")
-    
-    technical_data = collector.collect_technical_data(all_tickers)
-    collector.save_data(technical_data, 'technical_fundamental_smc.jsonl')
-    
-    print("Data collection complete!")
+"""
+Technical Analysis & Smart Money Concepts Data Collection
+Generates training data for TA patterns, indicators, and SMC concepts
+"""
+
+import yfinance as yf
+import pandas as pd
+import numpy as np
+import os
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+import diskcache
+from tqdm import tqdm
+try:
+    # Prebuilt by kernels_aot.py; skips the Numba import and first-call compile
+    from tapatterns_cc import candlestick_bits, latest_indicators, smc_scan
+except ImportError:
+    from tenali_kernels import candlestick_bits, latest_indicators, smc_scan
+from collect_utils import batch_download, load_checkpoint, write_jsonl
+
+# Row order of the per-symbol ohlcv array
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# (name, description) for each bit of candlestick_bits, lowest bit first
+CANDLESTICK_PATTERNS = (
+    ('Doji', 'Indecision in the market'),
+    ('Hammer', 'Potential bullish reversal'),
+    ('Shooting Star', 'Potential bearish reversal'),
+    ('Bullish Engulfing', 'Strong bullish reversal signal'),
+    ('Bearish Engulfing', 'Strong bearish reversal signal'),
+)
+
+# Training text layouts, each filled with a single str.format per example
+TREND_TEXT_TEMPLATE = """## Technical Analysis: {symbol}
+
+### Trend Analysis
+- **Current Price**: ${price:.2f}
+- **50-Day SMA**: ${sma_50:.2f}
+- **200-Day SMA**: ${sma_200:.2f}
+- **Trend**: {trend}
+- **Golden Cross**: {golden_cross}
+
+### Momentum Indicators
+- **RSI (14)**: {rsi:.2f} - {rsi_state}
+- **MACD**: {macd:.2f}
+- **MACD Signal**: {macd_signal:.2f}
+- **MACD Histogram**: {macd_hist:.2f} - {macd_bias}
+
+### Bollinger Bands
+- **Upper Band**: ${bb_upper:.2f}
+- **Middle Band**: ${bb_middle:.2f}
+- **Lower Band**: ${bb_lower:.2f}
+- **Position**: {bb_position}
+
+### Key Levels
+- **52-Week High**: ${high_52w:.2f}
+- **52-Week Low**: ${low_52w:.2f}
+- **Support**: ${support:.2f}
+- **Resistance**: ${resistance:.2f}
+
+*This analysis is for educational purposes only and not investment advice.*
+"""
+
+PATTERN_TEXT_TEMPLATE = """## Candlestick Patterns: {symbol}
+
+### Detected Patterns
+{patterns}
+
+### Interpretation
+Candlestick patterns provide insights into market psychology and potential reversals.
+Traders often use these patterns in conjunction with other technical indicators for confirmation.
+
+*This analysis is for educational purposes only and not investment advice.*
+"""
+
+SMC_TEXT_TEMPLATE = """## Smart Money Concepts (SMC) Analysis: {symbol}
+
+### Order Blocks (OB)
+Order blocks are areas where institutional traders (smart money) have placed significant orders.
+
+**Bullish Order Blocks:**
+{bullish_obs}
+
+**Bearish Order Blocks:**
+{bearish_obs}
+
+### Fair Value Gaps (FVG)
+FVGs are imbalances in price action where the market moves quickly, leaving gaps to be filled.
+
+**Identified FVGs:**
+{fvgs}
+
+### Market Structure
+**Break of Structure (BOS):** {bos_count} detected
+**Change of Character (CHOCH):** {choch_count} detected
+
+**Current Trend:** {trend}
+
+### Liquidity Zones
+- **Buy-Side Liquidity**: Above ${buy_side:.2f}
+- **Sell-Side Liquidity**: Below ${sell_side:.2f}
+
+### Premium/Discount Zones
+- **Premium Zone**: Above ${equilibrium:.2f} (selling opportunity)
+- **Discount Zone**: Below ${equilibrium:.2f} (buying opportunity)
+
+*This analysis is for educational purposes only and not investment advice.*
+"""
+
+FUNDAMENTAL_TEXT_TEMPLATE = """## Fundamental Analysis: {symbol}
+
+### Company Profile
+- **Sector**: {sector}
+- **Industry**: {industry}
+- **Market Cap**: {mcap_str}
+
+### Valuation Metrics
+- **P/E Ratio**: {pe} (Forward: {forward_pe})
+- **P/B Ratio**: {pb}
+- **Valuation Status**: {valuation}
+
+### Profitability & Health
+- **ROE**: {roe_str}
+- **Profit Margin**: {margin_str}
+- **Debt/Equity**: {debt_equity}
+
+### Investment Thesis
+Based on current metrics, {symbol} shows {profitability} profitability.
+The company operates in the {industry} industry.
+
+*This analysis is based on historical data and is not investment advice.*
+"""
+
+class TechnicalPatternsCollector:
+    def __init__(self, output_dir='./data/technical'):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # .info is the slowest Yahoo call; fundamentals barely move within a week
+        self.cache = diskcache.Cache(self.output_dir / '.cache')
+        
+    def collect_technical_data(self, symbols, filename='technical_fundamental_smc.jsonl', years=5):
+        """Generate TA/SMC training examples, streaming each symbol's examples to a resumable JSONL file"""
+        print(f"Generating technical analysis data for {len(symbols)} symbols...")
+        
+        filepath = self.output_dir / filename
+        done = load_checkpoint(filepath, 'symbol')
+        if done:
+            print(f"Resuming: {len(done)} symbols already written")
+            symbols = [s for s in symbols if s not in done]
+        
+        written = 0
+        
+        # Prices arrive 20 tickers per request; the per-symbol .info calls are still
+        # network-bound, so threads overlap those waits
+        pbar = tqdm(total=len(symbols))
+        with open(filepath, 'ab', buffering=1 << 20) as out, ThreadPoolExecutor(max_workers=16) as executor:
+            for batch_no, histories in enumerate(batch_download(symbols, period=f'{years}y'), 1):
+                for examples in executor.map(lambda item: self._process_symbol(*item), histories):
+                    # One write per symbol, so a crash never leaves half a symbol behind a full line
+                    out.write(b"".join(orjson.dumps(item) + b'\n' for item in examples))
+                    written += len(examples)
+                pbar.update(len(histories))
+                # Every 100 symbols (5 download batches) make the file durable for resuming
+                if batch_no % 5 == 0:
+                    out.flush()
+                    os.fsync(out.fileno())
+        pbar.close()
+        
+        print(f"Saved {written} items to {filepath}")
+        return written
+    
+    def _process_symbol(self, symbol, df):
+        """Build one symbol's TA, SMC and fundamental examples from its history ([] on failure)"""
+        try:
+            if len(df) < 200:
+                return []
+            
+            # One (5, n) float64 array, a contiguous row per field; every helper works on it
+            ohlcv = np.ascontiguousarray(df[OHLCV_COLUMNS].to_numpy(np.float64).T)
+            
+            # Generate TA examples
+            ta_examples = self._generate_ta_examples(symbol, ohlcv)
+            
+            # Generate SMC examples
+            smc_examples = self._generate_smc_examples(symbol, ohlcv, df.index)
+            
+            # Generate Fundamental examples
+            fund_examples = self._generate_fundamental_examples(symbol, self._cached_info(symbol))
+            
+            return ta_examples + smc_examples + fund_examples
+            
+        except Exception as e:
+            print(f"Error processing {symbol}: {e}")
+            return []
+    
+    def _cached_info(self, symbol):
+        """yf.Ticker(symbol).info, memoized on disk for 7 days"""
+        key = ('info', symbol)
+        info = self.cache.get(key)
+        if info is None:
+            info = yf.Ticker(symbol).info
+            self.cache.set(key, info, expire=7 * 86400)
+        return info
+    
+    def _generate_ta_examples(self, symbol, ohlcv):
+        """Generate technical analysis training examples"""
+        examples = []
+        
+        # Only the latest value of each indicator is used, so one compiled pass over
+        # the closes replaces the full-length rolling/ewm columns
+        _, high, low, close_arr, _ = ohlcv
+        price = close_arr[-1]
+        (sma_50, sma_200, rsi, macd, macd_signal, macd_hist,
+         bb_middle, bb_upper, bb_lower) = latest_indicators(close_arr)
+        
+        # Key levels straight from the NumPy tails (nan-aware, like Series.max/min)
+        high_52w, low_52w = np.nanmax(high[-252:]), np.nanmin(low[-252:])
+        support, resistance = np.nanmin(low[-20:]), np.nanmax(high[-20:])
+        
+        # Example 1: Trend Analysis
+        trend_text = TREND_TEXT_TEMPLATE.format(
+            symbol=symbol, price=price, sma_50=sma_50, sma_200=sma_200,
+            trend='Bullish' if price > sma_200 else 'Bearish',
+            golden_cross='Yes' if sma_50 > sma_200 else 'No',
+            rsi=rsi, rsi_state='Overbought' if rsi > 70 else 'Oversold' if rsi < 30 else 'Neutral',
+            macd=macd, macd_signal=macd_signal, macd_hist=macd_hist,
+            macd_bias='Bullish' if macd_hist > 0 else 'Bearish',
+            bb_upper=bb_upper, bb_middle=bb_middle, bb_lower=bb_lower,
+            bb_position=(
+                'Near upper band (overbought)' if price > bb_upper * 0.98
+                else 'Near lower band (oversold)' if price < bb_lower * 1.02
+                else 'Within bands'
+            ),
+            high_52w=high_52w, low_52w=low_52w, support=support, resistance=resistance,
+        )
+        
+        examples.append({
+            'symbol': symbol,
+            'type': 'technical_analysis',
+            'text': trend_text,
+        })
+        
+        # Example 2: Candlestick Patterns
+        patterns = self._identify_candlestick_patterns(ohlcv)
+        if patterns:
+            pattern_text = PATTERN_TEXT_TEMPLATE.format(
+                symbol=symbol,
+                patterns='\n'.join(f"- **{p['name']}**: {p['description']}" for p in patterns),
+            )
+            examples.append({
+                'symbol': symbol,
+                'type': 'candlestick_patterns',
+                'text': pattern_text,
+            })
+        
+        return examples
+    
+    def _generate_smc_examples(self, symbol, ohlcv, dates):
+        """Generate Smart Money Concepts training examples"""
+        examples = []
+        
+        # Order blocks, fair value gaps and structure breaks all come from one compiled sweep
+        o, high, low, close, _ = ohlcv
+        bullish_ob, bearish_ob, bullish_fvg, bearish_fvg, bos_count = smc_scan(o, high, low, close)
+        
+        # Identify Order Blocks
+        order_blocks = self._identify_order_blocks(ohlcv, dates, bullish_ob, bearish_ob)
+        
+        # Identify Fair Value Gaps
+        fvgs = self._identify_fair_value_gaps(ohlcv, bullish_fvg, bearish_fvg)
+        
+        # Identify BOS/CHOCH
+        structure_breaks = self._identify_structure_breaks(ohlcv, bos_count)
+        
+        # Liquidity and premium/discount levels from the NumPy tails
+        buy_side = np.nanmax(high[-20:])
+        sell_side = np.nanmin(low[-20:])
+        equilibrium = np.nanmean(close[-50:])
+        
+        def ob_lines(blocks):
+            if not blocks:
+                return '- None detected'
+            return '\n'.join(f"- ${ob['low']:.2f} - ${ob['high']:.2f} (Date: {ob['date']})" for ob in blocks[:3])
+        
+        smc_text = SMC_TEXT_TEMPLATE.format(
+            symbol=symbol,
+            bullish_obs=ob_lines(order_blocks['bullish']),
+            bearish_obs=ob_lines(order_blocks['bearish']),
+            fvgs='\n'.join(
+                f"- ${fvg['low']:.2f} - ${fvg['high']:.2f} ({'Filled' if fvg['filled'] else 'Unfilled'})" for fvg in fvgs[:5]
+            ) if fvgs else '- None detected',
+            buy_side=buy_side, sell_side=sell_side, equilibrium=equilibrium,
+            **structure_breaks,
+        )
+        
+        examples.append({
+            'symbol': symbol,
+            'type': 'smc_analysis',
+            'text': smc_text,
+        })
+        
+        return examples
+    
+    def _identify_candlestick_patterns(self, ohlcv):
+        """Identify candlestick patterns on the last candle (compiled kernel, simplified)"""
+        o, h, l, c, _ = ohlcv
+        bits = candlestick_bits(o, h, l, c)
+        return [
+            {'name': name, 'description': description}
+            for k, (name, description) in enumerate(CANDLESTICK_PATTERNS) if bits >> k & 1
+        ]
+    
+    def _identify_order_blocks(self, ohlcv, dates, bullish, bearish):
+        """Identify order blocks (simplified logic) from smc_scan's strong-move masks"""
+        _, h, l, _, _ = ohlcv
+        
+        def blocks(mask):
+            # Only the last 10 are kept, so only their (preceding) candles are read and formatted
+            idx = np.flatnonzero(mask)[-10:] - 1
+            return [{'low': l[k], 'high': h[k], 'date': d} for k, d in zip(idx, dates[idx].strftime('%Y-%m-%d'))]
+        
+        return {'bullish': blocks(bullish), 'bearish': blocks(bearish)}
+    
+    def _identify_fair_value_gaps(self, ohlcv, bullish_mask, bearish_mask):
+        """Identify fair value gaps from smc_scan's third-candle masks"""
+        _, h, l, _, _ = ohlcv
+        
+        # Lowest low / highest high from each bar to the end (NaN-skipping, like Series.min/max),
+        # so "filled" is one lookup per gap
+        suffix_low = np.fmin.accumulate(l[::-1])[::-1]
+        suffix_high = np.fmax.accumulate(h[::-1])[::-1]
+        
+        # Bullish FVG: Gap between candle 1 high and candle 3 low
+        bullish = np.flatnonzero(bullish_mask)
+        # Bearish FVG: Gap between candle 1 low and candle 3 high
+        bearish = np.flatnonzero(bearish_mask)
+        
+        # Merge in bar order (bullish before bearish on the same bar) and keep the last 20
+        keys = np.sort(np.concatenate([bullish * 2, bearish * 2 + 1]))[-20:]
+        
+        fvgs = []
+        for i, is_bearish in zip(keys // 2, keys % 2):
+            if is_bearish:
+                fvgs.append({
+                    'low': h[i],
+                    'high': l[i-2],
+                    'type': 'bearish',
+                    'filled': suffix_high[i] >= l[i-2],
+                })
+            else:
+                fvgs.append({
+                    'low': h[i-2],
+                    'high': l[i],
+                    'type': 'bullish',
+                    'filled': suffix_low[i] <= h[i-2],
+                })
+        
+        return fvgs
+    
+    def _identify_structure_breaks(self, ohlcv, bos_count):
+        """Identify BOS and CHOCH (simplified)"""
+        c = ohlcv[3]
+        
+        # BOS: Price breaks previous high/low in trend direction, counted by smc_scan
+        bos_count = int(bos_count)
+        choch_count = 0
+        
+        # Determine trend
+        if c[-1] > c[-50]:
+            trend = 'Bullish'
+        else:
+            trend = 'Bearish'
+        
+        return {
+            'bos_count': bos_count,
+            'choch_count': choch_count,
+            'trend': trend,
+        }
+    
+    def save_data(self, data, filename):
+        """Save collected data as JSONL"""
+        filepath = self.output_dir / filename
+        count = write_jsonl(filepath, data)
+        print(f"Saved {count} items to {filepath}")
+
+    def get_nse_tickers(self):
+        """Fetch all active NSE equity symbols"""
+        print("Fetching NSE ticker list...")
+        tickers = []
+        try:
+            # Official NSE Archives
+            url = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
+            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
+            response = requests.get(url, headers=headers, timeout=10)
+            if response.status_code == 200:
+                df = pd.read_csv(io.StringIO(response.text))
+                # Normalized and deduplicated in one pass; unique() keeps first-seen order
+                tickers = (df['SYMBOL'].astype(str).str.strip() + '.NS').unique().tolist()
+        except Exception as e:
+            print(f"Error fetching NSE list: {e}")
+            # Fallback
+            tickers = ["RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "INFY.NS", "ICICIBANK.NS"]
+            
+        return tickers
+
+    def _generate_fundamental_examples(self, symbol, info):
+        """Generate fundamental analysis training examples"""
+        if not info:
+            return []
+            
+        examples = []
+        
+        # Extract metrics with safe defaults
+        pe = info.get('trailingPE', 'N/A')
+        forward_pe = info.get('forwardPE', 'N/A')
+        pb = info.get('priceToBook', 'N/A')
+        roe = info.get('returnOnEquity', 'N/A')
+        debt_equity = info.get('debtToEquity', 'N/A')
+        profit_margin = info.get('profitMargins', 'N/A')
+        sector = info.get('sector', 'Unknown')
+        industry = info.get('industry', 'Unknown')
+        market_cap = info.get('marketCap', 0)
+        
+        # Format values
+        roe_str = f"{roe*100:.2f}%" if isinstance(roe, (int, float)) else roe
+        margin_str = f"{profit_margin*100:.2f}%" if isinstance(profit_margin, (int, float)) else profit_margin
+        mcap_str = f"${market_cap/1e9:.2f}B" if isinstance(market_cap, (int, float)) else "N/A"
+
+        pe_num = isinstance(pe, (int, float))
+        text = FUNDAMENTAL_TEXT_TEMPLATE.format(
+            symbol=symbol, sector=sector, industry=industry, mcap_str=mcap_str,
+            pe=pe, forward_pe=forward_pe, pb=pb,
+            valuation='Undervalued' if pe_num and pe < 15 else 'Overvalued' if pe_num and pe > 30 else 'Fairly Valued',
+            roe_str=roe_str, margin_str=margin_str, debt_equity=debt_equity,
+            profitability='strong' if isinstance(roe, (int, float)) and roe > 0.15 else 'moderate',
+        )
+        examples.append({
+            'symbol': symbol,
+            'type': 'fundamental_analysis',
+            'text': text
+        })
+        
+        return examples
+
+if __name__ == "__main__":
+    import requests
+    import io
+    
+    collector = TechnicalPatternsCollector()
+    
+    # Get full NSE list
+    print("Fetching full NSE ticker list...")
+    nse_tickers = collector.get_nse_tickers()
+    print(f"Found {len(nse_tickers)} NSE stocks.")
+    
+    # Also add some US tech giants for variety
+    us_tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'TSLA', 'META']
+    all_tickers = nse_tickers + us_tickers
+    
+    print(f"Starting analysis for {len(all_tickers)} companies...")
+    print("Note: This will take time. Progress is saved automatically.")
+    
+    # Examples are streamed to data/technical as each symbol finishes; re-running resumes
+    collector.collect_technical_data(all_tickers, 'technical_fundamental_smc.jsonl')
+    
+    print("Data collection complete!")
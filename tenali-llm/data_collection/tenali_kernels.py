@@ -0,0 +1,205 @@
+"""
+Numba kernels shared by the Tenali data collectors
+Compiled once and cached on disk (cache=True), so only the first run pays the JIT cost
+"""
+
+import numpy as np
+from numba import njit
+
+@njit(cache=True, fastmath=True)
+def compute_stats(close, high, low):
+    """
+    Single left-to-right pass over a price history.
+    Returns (all_time_high, all_time_low, daily_return_std, max_drawdown);
+    the std uses ddof=1 and max_drawdown is a fraction (e.g. -0.55), both unannualized.
+    """
+    n = close.shape[0]
+    ath = -np.inf
+    atl = np.inf
+    rmax = close[0]
+    max_dd = 0.0
+    # Welford running mean/variance of daily returns
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        if high[i] > ath:
+            ath = high[i]
+        if low[i] < atl:
+            atl = low[i]
+        if i > 0:
+            r = close[i] / close[i - 1] - 1.0
+            count += 1
+            delta = r - mean
+            mean += delta / count
+            m2 += delta * (r - mean)
+        if close[i] > rmax:
+            rmax = close[i]
+        dd = close[i] / rmax - 1.0
+        if dd < max_dd:
+            max_dd = dd
+    std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+    return ath, atl, std, max_dd
+
+@njit(cache=True)
+def trailing_sma_multi(close, windows):
+    """
+    Latest simple moving average for each window, summing only the trailing `w` closes.
+    A window longer than the history yields NaN, like the last value of rolling(w).mean().
+    """
+    n = close.shape[0]
+    out = np.empty(windows.shape[0])
+    for i in range(windows.shape[0]):
+        w = windows[i]
+        if w > n:
+            out[i] = np.nan
+            continue
+        s = 0.0
+        for j in range(n - w, n):
+            s += close[j]
+        out[i] = s / w
+    return out
+
+@njit(cache=True)
+def candlestick_bits(o, h, l, c):
+    """
+    Pattern bitmask for the last candle (against the one before it). Bit k is set for
+    pattern k of (doji, hammer, shooting_star, bullish_engulfing, bearish_engulfing);
+    every flag is computed branch-free from the same eight scalars.
+    """
+    co, ch, cl, cc = o[-1], h[-1], l[-1], c[-1]
+    po, pc = o[-2], c[-2]
+    body_size = abs(cc - co)
+    upper_shadow = ch - max(cc, co)
+    lower_shadow = min(cc, co) - cl
+    bits = int(body_size <= (ch - cl) * 0.1)
+    bits |= int((lower_shadow > body_size * 2) & (upper_shadow < body_size * 0.5)) << 1
+    bits |= int((upper_shadow > body_size * 2) & (lower_shadow < body_size * 0.5)) << 2
+    bits |= int((cc > co) & (pc < po) & (cc > po) & (co < pc)) << 3
+    bits |= int((cc < co) & (pc > po) & (cc < po) & (co > pc)) << 4
+    return bits
+
+@njit(cache=True)
+def latest_indicators(close):
+    """
+    Last-bar values of the TA indicators in one walk over the closes:
+    (sma50, sma200, rsi14, macd, macd_signal, macd_hist, bb_middle, bb_upper, bb_lower).
+    Same definitions as the pandas versions: RSI from 14-bar simple means of gains/losses,
+    MACD/signal as adjust=False EMAs (12/26/9), Bollinger as 20-bar mean +/- 2 sample std.
+    """
+    n = close.shape[0]
+    a12 = 2.0 / 13.0
+    a26 = 2.0 / 27.0
+    a9 = 2.0 / 10.0
+    ema12 = close[0]
+    ema26 = close[0]
+    signal = 0.0
+    s50 = 0.0
+    s200 = 0.0
+    s20 = 0.0
+    gain = 0.0
+    loss = 0.0
+    for i in range(n):
+        x = close[i]
+        if i > 0:
+            ema12 = a12 * x + (1.0 - a12) * ema12
+            ema26 = a26 * x + (1.0 - a26) * ema26
+            signal = a9 * (ema12 - ema26) + (1.0 - a9) * signal
+            if i >= n - 14:
+                d = x - close[i - 1]
+                if d > 0:
+                    gain += d
+                elif d < 0:
+                    loss -= d
+        if i >= n - 200:
+            s200 += x
+        if i >= n - 50:
+            s50 += x
+        if i >= n - 20:
+            s20 += x
+    
+    sma50 = s50 / 50 if n >= 50 else np.nan
+    sma200 = s200 / 200 if n >= 200 else np.nan
+    # gain/loss are 14-bar sums; their ratio equals the ratio of the means
+    if n < 14:
+        rsi = np.nan
+    elif loss == 0.0:
+        rsi = 100.0 if gain > 0.0 else np.nan
+    else:
+        rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+    macd = ema12 - ema26
+    
+    if n >= 20:
+        bb_mid = s20 / 20
+        var = 0.0
+        for i in range(n - 20, n):
+            var += (close[i] - bb_mid) ** 2
+        bb_std = np.sqrt(var / 19)
+    else:
+        bb_mid = np.nan
+        bb_std = np.nan
+    return sma50, sma200, rsi, macd, signal, macd - signal, bb_mid, bb_mid + 2 * bb_std, bb_mid - 2 * bb_std
+
+@njit(cache=True)
+def smc_scan(o, h, l, c):
+    """
+    Smart-money events in one sweep over the candles:
+    (bullish_ob, bearish_ob, bullish_fvg, bearish_fvg, bos_count).
+    Order blocks are >2% body candles against the previous candle's direction, flagged for
+    20 <= i < n-1 (the block itself is candle i-1). Fair value gaps are flagged on the third
+    candle. A break of structure is a close outside the previous 20 bars' high/low range;
+    like pandas rolling(20), a window holding a NaN never counts.
+    """
+    n = c.shape[0]
+    bullish_ob = np.zeros(n, np.bool_)
+    bearish_ob = np.zeros(n, np.bool_)
+    bullish_fvg = np.zeros(n, np.bool_)
+    bearish_fvg = np.zeros(n, np.bool_)
+    bos_count = 0
+    # Monotonic deques of indices: window max of highs at hq[hh], window min of lows at lq[lh]
+    hq = np.empty(n, np.int64)
+    lq = np.empty(n, np.int64)
+    hh = 0
+    ht = 0
+    lh = 0
+    lt = 0
+    h_valid = 0
+    l_valid = 0
+    for i in range(n):
+        # The deques hold bars i-20..i-1 here
+        if i >= 20:
+            if (h_valid == 20 and c[i] > h[hq[hh]]) or (l_valid == 20 and c[i] < l[lq[lh]]):
+                bos_count += 1
+            if i < n - 1:
+                body = c[i] - o[i]
+                if body > 0 and body > c[i] * 0.02 and c[i - 1] < o[i - 1]:
+                    bullish_ob[i] = True
+                if body < 0 and -body > c[i] * 0.02 and c[i - 1] > o[i - 1]:
+                    bearish_ob[i] = True
+        if i >= 2:
+            bullish_fvg[i] = l[i] > h[i - 2]
+            bearish_fvg[i] = h[i] < l[i - 2]
+        
+        # Slide the window forward to bars i-19..i
+        if not np.isnan(h[i]):
+            h_valid += 1
+            while ht > hh and h[hq[ht - 1]] <= h[i]:
+                ht -= 1
+            hq[ht] = i
+            ht += 1
+        if not np.isnan(l[i]):
+            l_valid += 1
+            while lt > lh and l[lq[lt - 1]] >= l[i]:
+                lt -= 1
+            lq[lt] = i
+            lt += 1
+        if i >= 20:
+            if not np.isnan(h[i - 20]):
+                h_valid -= 1
+            if not np.isnan(l[i - 20]):
+                l_valid -= 1
+        while ht > hh and hq[hh] <= i - 20:
+            hh += 1
+        while lt > lh and lq[lh] <= i - 20:
+            lh += 1
+    return bullish_ob, bearish_ob, bullish_fvg, bearish_fvg, bos_count
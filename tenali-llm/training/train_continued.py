@@ -1,159 +1,249 @@
-"""
-Continued Pre-training on LLaMA 3.1 with Financial Data
-Hybrid approach: Start with pre-trained model, continue training on financial corpus
-"""
-
-import torch
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    TrainingArguments,
-    Trainer,
-    DataCollatorForLanguageModeling,
-)
-from datasets import load_from_disk
-import wandb
-from pathlib import Path
-
-class TenaliContinuedTrainer:
-    def __init__(
-        self,
-        base_model="meta-llama/Meta-Llama-3.1-70B",
-        data_path="./training_data/train",
-        output_dir="./checkpoints/continued",
-    ):
-        self.base_model = base_model
-        self.data_path = data_path
-        self.output_dir = output_dir
-        
-        # Initialize Weights & Biases
-        wandb.init(project="tenali-llm", name="continued-pretraining")
-        
-    def load_model_and_tokenizer(self):
-        """Load base model and tokenizer"""
-        print(f"Loading {self.base_model}...")
-        
-        self.tokenizer = AutoTokenizer.from_pretrained(self.base_model)
-        self.tokenizer.pad_token = self.tokenizer.eos_token
-        
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.base_model,
-            torch_dtype=torch.bfloat16,
-            device_map="auto",
-            use_cache=False,  # Required for gradient checkpointing
-        )
-        
-        # Enable gradient checkpointing for memory efficiency
-        self.model.gradient_checkpointing_enable()
-        
-        print(f"Model loaded: {self.model.num_parameters() / 1e9:.1f}B parameters")
-        
-    def load_dataset(self):
-        """Load prepared training dataset"""
-        print(f"Loading dataset from {self.data_path}...")
-        
-        self.train_dataset = load_from_disk(self.data_path)
-        self.val_dataset = load_from_disk(self.data_path.replace('train', 'validation'))
-        
-        # Tokenize
-        def tokenize_function(examples):
-            # Combine system + instruction + output
-            texts = [
-                f"{ex['system']}\n\nUser: {ex['instruction']}\n\nAssistant: {ex['output']}"
-                for ex in zip(
-                    examples['system'],
-                    examples['instruction'],
-                    examples['output']
-                )
-            ]
-            
-            return self.tokenizer(
-                texts,
-                truncation=True,
-                max_length=2048,
-                padding=False,
-            )
-        
-        self.train_dataset = self.train_dataset.map(
-            tokenize_function,
-            batched=True,
-            remove_columns=self.train_dataset.column_names,
-        )
-        
-        self.val_dataset = self.val_dataset.map(
-            tokenize_function,
-            batched=True,
-            remove_columns=self.val_dataset.column_names,
-        )
-        
-        print(f"Train: {len(self.train_dataset)} examples")
-        print(f"Validation: {len(self.val_dataset)} examples")
-        
-    def train(self):
-        """Run continued pre-training"""
-        print("Starting continued pre-training...")
-        
-        # Training arguments
-        training_args = TrainingArguments(
-            output_dir=self.output_dir,
-            num_train_epochs=1,  # 1 epoch through 100B tokens
-            per_device_train_batch_size=1,
-            per_device_eval_batch_size=1,
-            gradient_accumulation_steps=16,  # Effective batch size = 16
-            learning_rate=1e-5,  # Lower than from-scratch
-            weight_decay=0.01,
-            warmup_steps=1000,
-            logging_steps=10,
-            save_steps=1000,
-            eval_steps=1000,
-            save_total_limit=3,
-            bf16=True,
-            gradient_checkpointing=True,
-            dataloader_num_workers=4,
-            report_to="wandb",
-            load_best_model_at_end=True,
-            metric_for_best_model="eval_loss",
-        )
-        
-        # Data collator
-        data_collator = DataCollatorForLanguageModeling(
-            tokenizer=self.tokenizer,
-            mlm=False,  # Causal LM, not masked LM
-        )
-        
-        # Trainer
-        trainer = Trainer(
-            model=self.model,
-            args=training_args,
-            train_dataset=self.train_dataset,
-            eval_dataset=self.val_dataset,
-            data_collator=data_collator,
-        )
-        
-        # Train
-        trainer.train()
-        
-        # Save final model
-        final_dir = f"{self.output_dir}/final"
-        trainer.save_model(final_dir)
-        self.tokenizer.save_pretrained(final_dir)
-        
-        print(f"Training complete! Model saved to {final_dir}")
-
-if __name__ == "__main__":
-    # Initialize trainer
-    trainer = TenaliContinuedTrainer(
-        base_model="Qwen/Qwen2.5-1.5B-Instruct",
-        data_path="./training_data/train",
-        output_dir="./checkpoints/continued",
-    )
-    
-    # Load model and data
-    trainer.load_model_and_tokenizer()
-    trainer.load_dataset()
-    
-    # Train
-    trainer.train()
-    
-    print("Continued pre-training complete!")
-    print("Next step: Instruction fine-tuning with train_instruction.py")
+"""
+Continued Pre-training on LLaMA 3.1 with Financial Data
+Hybrid approach: Start with pre-trained model, continue training on financial corpus
+"""
+
+import torch
+from transformers import (
+    AutoConfig,
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    TrainingArguments,
+    Trainer,
+    default_data_collator,
+)
+from accelerate import init_empty_weights
+from datasets import DatasetDict, load_from_disk
+import wandb
+import math
+import os
+from train_utils import attn_implementation, load_tokenized, probe_batch_size
+
+# TF32 tensor cores for the fp32 work left in a bf16 run (reductions, loss, optimizer step)
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+torch.set_float32_matmul_precision("high")
+
+class TenaliContinuedTrainer:
+    def __init__(
+        self,
+        base_model="meta-llama/Meta-Llama-3.1-70B",
+        data_path="./training_data/train",
+        output_dir="./checkpoints/continued",
+    ):
+        self.base_model = base_model
+        self.data_path = data_path
+        self.output_dir = output_dir
+        
+        # Log offline when there is no W&B key, so nothing waits on the network
+        if not os.getenv("WANDB_API_KEY"):
+            os.environ["WANDB_MODE"] = "offline"
+        
+    def device_map(self, config):
+        """
+        Pin the whole model to this rank's GPU when full fine-tuning state fits there; only
+        fall back to accelerate's "auto" split (per-layer hooks, possible CPU offload) when it doesn't
+        """
+        if not torch.cuda.is_available():
+            return "auto"
+        local_rank = int(os.getenv("LOCAL_RANK", 0))
+        # Parameter count from a weightless meta-device instantiation of the config
+        with init_empty_weights():
+            meta_model = AutoModelForCausalLM.from_config(config)
+        # Every parameter trains: bf16 weights and grads (2 + 2 bytes) plus two AdamW moments
+        # (up to 4 + 4) is ~12 bytes/param, with 25% on top for checkpointed activations
+        train_state_bytes = meta_model.num_parameters() * 12
+        fits = torch.cuda.mem_get_info(local_rank)[1] > train_state_bytes * 1.25
+        return {"": local_rank} if fits else "auto"
+        
+    def load_model_and_tokenizer(self):
+        """Load base model and tokenizer"""
+        print(f"Loading {self.base_model}...")
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(self.base_model, use_fast=True)
+        self.tokenizer.pad_token = self.tokenizer.eos_token
+        
+        # Training only needs the loss: no KV cache, attention maps or per-layer hidden states
+        config = AutoConfig.from_pretrained(
+            self.base_model,
+            use_cache=False,  # Required for gradient checkpointing
+            output_attentions=False,
+            output_hidden_states=False,
+            return_dict=True,
+        )
+        
+        self.model = AutoModelForCausalLM.from_pretrained(
+            self.base_model,
+            config=config,
+            torch_dtype=torch.bfloat16,  # Flash/SDPA fused kernels need bf16/fp16
+            attn_implementation=attn_implementation(),
+            device_map=self.device_map(config),
+        )
+        
+        # Enable gradient checkpointing for memory efficiency
+        self.model.gradient_checkpointing_enable()
+        
+        print(f"Model loaded: {self.model.num_parameters() / 1e9:.1f}B parameters")
+        
+    def load_dataset(self):
+        """Load prepared training dataset, tokenized once and cached on disk"""
+        val_path = self.data_path.replace('train', 'validation')
+        tokenized = load_tokenized((self.data_path, val_path), self.tokenizer, 2048, lambda: self._tokenize_splits(val_path))
+        self.train_dataset = tokenized['train']
+        self.val_dataset = tokenized['validation']
+        
+        print(f"Train: {len(self.train_dataset)} examples")
+        print(f"Validation: {len(self.val_dataset)} examples")
+        
+    def _tokenize_splits(self, val_path):
+        """Tokenize and pack both splits into 2048-token blocks"""
+        print(f"Loading dataset from {self.data_path}...")
+        
+        train_dataset = load_from_disk(self.data_path)
+        val_dataset = load_from_disk(val_path)
+        
+        # Bound to a local so worker processes pickle only the tokenizer, not the model on self
+        tokenizer = self.tokenizer
+        
+        # Tokenize
+        def tokenize_function(examples):
+            # Render system + instruction + output with the model's chat template, the same
+            # format the API builds its prompts with
+            conversations = [
+                [
+                    {"role": "system", "content": sys},
+                    {"role": "user", "content": inst},
+                    {"role": "assistant", "content": out},
+                ]
+                for sys, inst, out in zip(
+                    examples['system'],
+                    examples['instruction'],
+                    examples['output']
+                )
+            ]
+            
+            # No truncation: long documents simply span several packed blocks
+            return {'input_ids': tokenizer.apply_chat_template(conversations, return_dict=True)['input_ids']}
+        
+        block_size = 2048
+        eos_id = tokenizer.eos_token_id
+        
+        # Pack documents into full blocks so no token is padding
+        def group_texts(examples):
+            # EOS separates documents; the tail shorter than a block is dropped
+            concatenated = [t for ids in examples['input_ids'] for t in (*ids, eos_id)]
+            total = len(concatenated) // block_size * block_size
+            blocks = [concatenated[i:i + block_size] for i in range(0, total, block_size)]
+            return {'input_ids': blocks, 'labels': blocks}  # the model shifts labels internally
+        
+        train_dataset = train_dataset.map(
+            tokenize_function,
+            batched=True,
+            num_proc=os.cpu_count(),
+            batch_size=4096,  # Fewer, larger calls into the Rust tokenizer
+            remove_columns=train_dataset.column_names,
+        ).map(group_texts, batched=True, num_proc=os.cpu_count())
+        
+        val_dataset = val_dataset.map(
+            tokenize_function,
+            batched=True,
+            num_proc=os.cpu_count(),
+            batch_size=4096,  # Fewer, larger calls into the Rust tokenizer
+            remove_columns=val_dataset.column_names,
+        ).map(group_texts, batched=True, num_proc=os.cpu_count())
+        
+        return DatasetDict(train=train_dataset, validation=val_dataset)
+        
+    def train(self):
+        """Run continued pre-training"""
+        print("Starting continued pre-training...")
+        
+        # Largest micro-batch that fits; accumulation keeps the effective batch at 16
+        batch_size = probe_batch_size(self.model, self.tokenizer.eos_token_id, max_length=2048)
+        print(f"Micro-batch size: {batch_size}")
+        
+        report_to = "none" if os.getenv("WANDB_MODE") == "disabled" else "wandb"
+        
+        # Stream the packed train split shard by shard: sequential reads of the memory-mapped
+        # blocks instead of random row access paging the whole corpus into RAM. Validation
+        # stays a regular Dataset since it is small.
+        num_blocks = len(self.train_dataset)
+        train_stream = self.train_dataset.to_iterable_dataset(
+            num_shards=min(64, num_blocks)
+        ).shuffle(seed=42, buffer_size=10_000)
+        gradient_accumulation_steps = max(1, 16 // batch_size)  # Effective batch size = 16
+        world_size = int(os.getenv("WORLD_SIZE", "1"))
+        
+        # Training arguments
+        training_args = TrainingArguments(
+            output_dir=self.output_dir,
+            # 1 epoch through 100B tokens; iterable datasets have no length, so count steps
+            max_steps=math.ceil(num_blocks / (batch_size * gradient_accumulation_steps * world_size)),
+            per_device_train_batch_size=batch_size,
+            per_device_eval_batch_size=batch_size,
+            gradient_accumulation_steps=gradient_accumulation_steps,
+            learning_rate=1e-5,  # Lower than from-scratch
+            weight_decay=0.01,
+            warmup_steps=1000,
+            logging_steps=10,
+            save_steps=1000,
+            eval_steps=1000,
+            save_total_limit=3,
+            bf16=True,
+            # Full fine-tuning: every weight is in the loss graph and gets a gradient, so DDP can skip
+            # the unused-param scan; Trainer then wraps non-final accumulation micro-batches in no_sync()
+            ddp_find_unused_parameters=False,
+            gradient_checkpointing=True,
+            # Trainer compiles the model itself, so save_model still sees the uncompiled module;
+            # TENALI_COMPILE=0 trains eagerly for debugging
+            torch_compile=os.getenv("TENALI_COMPILE", "1") == "1",
+            dataloader_pin_memory=True,
+            dataloader_num_workers=max(4, os.cpu_count() // 2),
+            dataloader_prefetch_factor=4,
+            report_to=report_to,
+            load_best_model_at_end=True,
+            metric_for_best_model="eval_loss",
+            # Every rank iterates the stream itself instead of rank 0 reading and broadcasting batches
+            accelerator_config={"dispatch_batches": False},
+        )
+        
+        # Trainer
+        trainer = Trainer(
+            model=self.model,
+            args=training_args,
+            train_dataset=train_stream,
+            eval_dataset=self.val_dataset,
+            data_collator=default_data_collator,  # Packed blocks need no padding
+        )
+        
+        # Initialize Weights & Biases here, after model load, so its handshake doesn't delay it
+        if report_to == "wandb":
+            wandb.init(project="tenali-llm", name="continued-pretraining")
+        
+        # Train
+        trainer.train()
+        
+        # Save final model
+        final_dir = f"{self.output_dir}/final"
+        trainer.save_model(final_dir)
+        self.tokenizer.save_pretrained(final_dir)
+        
+        print(f"Training complete! Model saved to {final_dir}")
+
+if __name__ == "__main__":
+    # Initialize trainer
+    trainer = TenaliContinuedTrainer(
+        base_model="Qwen/Qwen2.5-1.5B-Instruct",
+        data_path="./training_data/train",
+        output_dir="./checkpoints/continued",
+    )
+    
+    # Load model and data
+    trainer.load_model_and_tokenizer()
+    trainer.load_dataset()
+    
+    # Train
+    trainer.train()
+    
+    print("Continued pre-training complete!")
+    print("Next step: Instruction fine-tuning with train_instruction.py")
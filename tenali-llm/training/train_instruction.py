@@ -1,199 +1,272 @@
-"""
-Instruction Fine-tuning for Tenali Persona
-Teaches the model your custom response format and financial expertise
-"""
-
-import torch
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    TrainingArguments,
-    Trainer,
-)
-from datasets import load_from_disk
-from peft import LoraConfig, get_peft_model, prepare_model_for_kbit_training
-import wandb
-from dotenv import load_dotenv
-import os
-
-# Load environment variables (HF_TOKEN, etc.)
-load_dotenv()
-# Also try loading from parent dirs if needed
-from pathlib import Path
-env_path = Path('../finos-app/.env.local')
-if env_path.exists():
-    load_dotenv(env_path)
-
-class TenaliInstructionTrainer:
-    def __init__(
-        self,
-        base_model="./checkpoints/continued/final",
-        data_path="./training_data/train",
-        output_dir="./checkpoints/instruction",
-    ):
-        self.base_model = base_model
-        self.data_path = data_path
-        self.output_dir = output_dir
-        
-        # Disable W&B online requirement to reduce friction
-        if not os.getenv("WANDB_API_KEY"):
-            os.environ["WANDB_MODE"] = "offline"
-            
-        wandb.init(project="tenali-llm", name="instruction-finetuning")
-        
-    def load_model_with_lora(self):
-        """Load model and apply LoRA for efficient fine-tuning"""
-        import os
-        
-        # Check if local checkpoint exists
-        if os.path.exists(self.base_model):
-            print(f"Loading local checkpoint from {self.base_model}...")
-            model_id = self.base_model
-        else:
-            print(f"Local checkpoint not found at {self.base_model}")
-            print("Falling back to base model: Qwen/Qwen2.5-1.5B-Instruct")
-            model_id = "Qwen/Qwen2.5-1.5B-Instruct"
-            
-        # Configure 4-bit quantization
-        from transformers import BitsAndBytesConfig
-        bnb_config = BitsAndBytesConfig(
-            load_in_4bit=True,
-            bnb_4bit_quant_type="nf4",
-            bnb_4bit_compute_dtype=torch.bfloat16,
-            bnb_4bit_use_double_quant=True,
-        )
-
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained(model_id)
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-            
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_id,
-                quantization_config=bnb_config,
-                device_map={"": 0},
-            )
-        except OSError as e:
-            if "gated repo" in str(e) or "401" in str(e):
-                print("\n" + "="*60)
-                print("❌ AUTHENTICATION ERROR: GATED MODEL ACCESS DENIED")
-                print("="*60)
-                print(f"The model '{model_id}' is a gated repository.")
-                print("You must accept the license terms on Hugging Face:")
-                print(f"🔗 https://huggingface.co/{model_id}")
-                print("\nAND ensure you have set HF_TOKEN in your .env file.")
-                print("Get your token here: https://huggingface.co/settings/tokens")
-                print("="*60 + "\n")
-                raise e
-            else:
-                raise e
-        
-        # Enable gradients for input embeddings (required for gradient checkpointing)
-        self.model.enable_input_require_grads()
-        
-        # Prepare for k-bit training
-        self.model = prepare_model_for_kbit_training(self.model)
-        
-        # LoRA configuration
-        lora_config = LoraConfig(
-            r=16,  # Rank
-            lora_alpha=32,
-            target_modules=["q_proj", "v_proj", "k_proj", "o_proj"],
-            lora_dropout=0.05,
-            bias="none",
-            task_type="CAUSAL_LM",
-        )
-        
-        self.model = get_peft_model(self.model, lora_config)
-        self.model.print_trainable_parameters()
-        
-    def load_dataset(self):
-        """Load instruction dataset"""
-        print(f"Loading dataset from {self.data_path}...")
-        
-        from pathlib import Path
-        val_path = str(Path(self.data_path).parent / "validation")
-        
-        self.train_dataset = load_from_disk(self.data_path)
-        self.val_dataset = load_from_disk(val_path)
-        
-        # Tokenize dataset
-        def tokenize_function(examples):
-            # Combine system + instruction + output
-            texts = [
-                f"{sys}\n\nUser: {inst}\n\nAssistant: {out}"
-                for sys, inst, out in zip(
-                    examples['system'],
-                    examples['instruction'],
-                    examples['output']
-                )
-            ]
-            
-            tokenized = self.tokenizer(
-                texts,
-                truncation=True,
-                max_length=1024,  # Reduced from 2048 to save memory
-                padding="max_length",
-            )
-            tokenized["labels"] = tokenized["input_ids"].copy()
-            return tokenized
-            
-        print("Tokenizing dataset...")
-        self.train_dataset = self.train_dataset.map(tokenize_function, batched=True)
-        self.val_dataset = self.val_dataset.map(tokenize_function, batched=True)
-        
-        print(f"Train: {len(self.train_dataset)} examples")
-        print(f"Validation: {len(self.val_dataset)} examples")
-        
-    def train(self):
-        """Run instruction fine-tuning"""
-        print("Starting instruction fine-tuning...")
-        
-        # Clear cache before training
-        torch.cuda.empty_cache()
-        
-        training_args = TrainingArguments(
-            output_dir=self.output_dir,
-            num_train_epochs=3,
-            per_device_train_batch_size=1,
-            per_device_eval_batch_size=1,
-            gradient_accumulation_steps=16,
-            learning_rate=2e-4,
-            weight_decay=0.01,
-            warmup_steps=100,
-            logging_steps=10,
-            save_strategy="steps",
-            save_steps=500,
-            eval_strategy="steps",
-            eval_steps=500,
-            save_total_limit=3,
-            bf16=True,
-            gradient_checkpointing=True,
-            report_to="wandb",
-            load_best_model_at_end=True,
-            optim="paged_adamw_8bit",  # Use paged optimizer to save VRAM
-        )
-        
-        trainer = Trainer(
-            model=self.model,
-            args=training_args,
-            train_dataset=self.train_dataset,
-            eval_dataset=self.val_dataset,
-        )
-        
-        trainer.train()
-        
-        # Save final model
-        final_dir = f"{self.output_dir}/final"
-        trainer.save_model(final_dir)
-        self.tokenizer.save_pretrained(final_dir)
-        
-        print(f"Training complete! Model saved to {final_dir}")
-
-if __name__ == "__main__":
-    trainer = TenaliInstructionTrainer()
-    trainer.load_model_with_lora()
-    trainer.load_dataset()
-    trainer.train()
-    
-    print("Instruction fine-tuning complete!")
-    print("Tenali is ready for deployment!")
+"""
+Instruction Fine-tuning for Tenali Persona
+Teaches the model your custom response format and financial expertise
+"""
+
+import torch
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    TrainingArguments,
+    Trainer,
+    DataCollatorForSeq2Seq,
+)
+from datasets import DatasetDict, load_from_disk
+from peft import LoraConfig, get_peft_model
+import wandb
+from dotenv import load_dotenv
+import os
+from train_utils import attn_implementation, load_tokenized, probe_batch_size
+
+# TF32 tensor cores for the fp32 work left in a bf16 run (reductions, loss, optimizer step)
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+torch.set_float32_matmul_precision("high")
+
+# Load environment variables (HF_TOKEN, etc.)
+load_dotenv()
+# Also try loading from parent dirs if needed
+from pathlib import Path
+env_path = Path('../finos-app/.env.local')
+if env_path.exists():
+    load_dotenv(env_path)
+
+class TenaliInstructionTrainer:
+    def __init__(
+        self,
+        base_model="./checkpoints/continued/final",
+        data_path="./training_data/train",
+        output_dir="./checkpoints/instruction",
+    ):
+        self.base_model = base_model
+        self.data_path = data_path
+        self.output_dir = output_dir
+        
+        # Disable W&B online requirement to reduce friction
+        if not os.getenv("WANDB_API_KEY"):
+            os.environ["WANDB_MODE"] = "offline"
+            
+        wandb.init(project="tenali-llm", name="instruction-finetuning")
+        
+    def load_model_with_lora(self):
+        """Load model and apply LoRA for efficient fine-tuning"""
+        import os
+        
+        # Check if local checkpoint exists
+        if os.path.exists(self.base_model):
+            print(f"Loading local checkpoint from {self.base_model}...")
+            model_id = self.base_model
+        else:
+            print(f"Local checkpoint not found at {self.base_model}")
+            print("Falling back to base model: Qwen/Qwen2.5-1.5B-Instruct")
+            model_id = "Qwen/Qwen2.5-1.5B-Instruct"
+            
+        # Configure 4-bit quantization
+        from transformers import BitsAndBytesConfig
+        bnb_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.bfloat16,
+            bnb_4bit_use_double_quant=True,
+            # Pack NF4 weights into bf16-typed storage so torch.compile/FSDP see a uniform dtype
+            bnb_4bit_quant_storage=torch.bfloat16,
+        )
+
+        try:
+            self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+            
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_id,
+                quantization_config=bnb_config,
+                torch_dtype=torch.bfloat16,  # Flash/SDPA fused kernels need bf16/fp16
+                attn_implementation=attn_implementation(),
+                device_map={"": int(os.getenv("LOCAL_RANK", 0))},  # this rank's GPU under torchrun
+            )
+        except OSError as e:
+            if "gated repo" in str(e) or "401" in str(e):
+                print("\n" + "="*60)
+                print("❌ AUTHENTICATION ERROR: GATED MODEL ACCESS DENIED")
+                print("="*60)
+                print(f"The model '{model_id}' is a gated repository.")
+                print("You must accept the license terms on Hugging Face:")
+                print(f"🔗 https://huggingface.co/{model_id}")
+                print("\nAND ensure you have set HF_TOKEN in your .env file.")
+                print("Get your token here: https://huggingface.co/settings/tokens")
+                print("="*60 + "\n")
+                raise e
+            else:
+                raise e
+        
+        # Minimal k-bit prep: prepare_model_for_kbit_training would upcast layernorms and
+        # embeddings to fp32, costing more VRAM than it saves on a model this size
+        self.model.gradient_checkpointing_enable(gradient_checkpointing_kwargs={"use_reentrant": False})
+        # Enable gradients for input embeddings (required for gradient checkpointing)
+        self.model.enable_input_require_grads()
+        
+        # LoRA configuration
+        lora_config = LoraConfig(
+            r=16,  # Rank
+            lora_alpha=32,
+            use_rslora=True,  # Scale by alpha/sqrt(r) rather than alpha/r
+            # Attention plus the MLP projections, which hold most of the weights
+            target_modules=["q_proj", "k_proj", "v_proj", "o_proj", "gate_proj", "up_proj", "down_proj"],
+            lora_dropout=0.05,
+            bias="none",
+            task_type="CAUSAL_LM",
+        )
+        
+        self.model = get_peft_model(self.model, lora_config)
+        self.model.print_trainable_parameters()
+        
+    def load_dataset(self):
+        """Load instruction dataset, tokenized once and cached on disk"""
+        val_path = str(Path(self.data_path).parent / "validation")
+        tokenized = load_tokenized((self.data_path, val_path), self.tokenizer, 1024, lambda: self._tokenize_splits(val_path))
+        self.train_dataset = tokenized["train"]
+        self.val_dataset = tokenized["validation"]
+        
+        print(f"Train: {len(self.train_dataset)} examples")
+        print(f"Validation: {len(self.val_dataset)} examples")
+        
+    def _tokenize_splits(self, val_path):
+        """Tokenize both splits with completion-only labels"""
+        print(f"Loading dataset from {self.data_path}...")
+        
+        train_dataset = load_from_disk(self.data_path)
+        val_dataset = load_from_disk(val_path)
+        
+        # Bound to a local so worker processes pickle only the tokenizer, not the model on self
+        tokenizer = self.tokenizer
+        
+        max_length = 1024  # Reduced from 2048 to save memory
+        
+        # Tokenize dataset
+        def tokenize_function(examples):
+            # Chat-template rendering, matching how the API formats prompts at inference.
+            # The prompt is rendered with the assistant header, so its length is exactly where
+            # the response starts in the full conversation.
+            prompts = [
+                [{"role": "system", "content": sys}, {"role": "user", "content": inst}]
+                for sys, inst in zip(examples['system'], examples['instruction'])
+            ]
+            prompt_ids = tokenizer.apply_chat_template(
+                prompts, add_generation_prompt=True, return_dict=True
+            )["input_ids"]
+            full_ids = tokenizer.apply_chat_template(
+                [
+                    messages + [{"role": "assistant", "content": out}]
+                    for messages, out in zip(prompts, examples['output'])
+                ],
+                return_dict=True,
+            )["input_ids"]
+            
+            tokenized = {"input_ids": [], "attention_mask": [], "labels": []}
+            for prompt, ids in zip(prompt_ids, full_ids):
+                if len(prompt) >= max_length:
+                    continue  # Response fully truncated away; nothing to learn from
+                ids = ids[:max_length]
+                tokenized["input_ids"].append(ids)
+                tokenized["attention_mask"].append([1] * len(ids))
+                # Completion-only loss: prompt positions are ignored (-100)
+                tokenized["labels"].append([-100] * len(prompt) + ids[len(prompt):])
+            # Token counts for length-grouped batching
+            tokenized["length"] = [len(ids) for ids in tokenized["input_ids"]]
+            return tokenized
+            
+        print("Tokenizing dataset...")
+        train_dataset = train_dataset.map(
+            tokenize_function,
+            batched=True,
+            num_proc=os.cpu_count(),
+            batch_size=4096,  # Fewer, larger calls into the Rust tokenizer
+            remove_columns=train_dataset.column_names,
+        )
+        val_dataset = val_dataset.map(
+            tokenize_function,
+            batched=True,
+            num_proc=os.cpu_count(),
+            batch_size=4096,  # Fewer, larger calls into the Rust tokenizer
+            remove_columns=val_dataset.column_names,
+        )
+        
+        return DatasetDict(train=train_dataset, validation=val_dataset)
+        
+    def train(self):
+        """Run instruction fine-tuning"""
+        print("Starting instruction fine-tuning...")
+        
+        # Largest micro-batch that fits; accumulation keeps the effective batch at 16
+        batch_size = probe_batch_size(self.model, self.tokenizer.eos_token_id, max_length=1024)
+        print(f"Micro-batch size: {batch_size}")
+        
+        # Clear cache before training
+        torch.cuda.empty_cache()
+        
+        training_args = TrainingArguments(
+            output_dir=self.output_dir,
+            num_train_epochs=3,
+            per_device_train_batch_size=batch_size,
+            per_device_eval_batch_size=batch_size,
+            gradient_accumulation_steps=max(1, 16 // batch_size),
+            learning_rate=2e-4,
+            weight_decay=0.01,
+            warmup_steps=100,
+            logging_steps=10,
+            save_strategy="steps",
+            save_steps=500,
+            eval_strategy="steps",
+            eval_steps=500,
+            save_total_limit=3,
+            bf16=True,
+            dataloader_pin_memory=True,
+            dataloader_num_workers=max(4, os.cpu_count() // 2),
+            dataloader_prefetch_factor=4,
+            # Every LoRA/base trainable param gets a gradient, so DDP can skip the unused-param scan;
+            # Trainer then wraps non-final accumulation micro-batches in no_sync()
+            ddp_find_unused_parameters=False,
+            gradient_checkpointing=True,
+            gradient_checkpointing_kwargs={"use_reentrant": False},
+            group_by_length=True,  # Batch similar-length examples to minimise padding
+            length_column_name="length",
+            # Trainer compiles the (PEFT-wrapped) model itself, so saving still sees the plain module;
+            # TENALI_COMPILE=0 trains eagerly for debugging
+            torch_compile=os.getenv("TENALI_COMPILE", "1") == "1",
+            report_to="wandb",
+            load_best_model_at_end=True,
+            # LoRA optimizer state is only a few MB, so keep it resident on the GPU;
+            # set TENALI_OPTIM=paged_adamw_8bit if long-sequence batches hit OOM spikes
+            optim=os.getenv("TENALI_OPTIM", "adamw_bnb_8bit"),
+        )
+        
+        trainer = Trainer(
+            model=self.model,
+            args=training_args,
+            train_dataset=self.train_dataset,
+            eval_dataset=self.val_dataset,
+            # Pads each batch to its longest sequence (multiple of 8 for tensor cores);
+            # labels are padded with -100 so the prompt mask survives collation
+            data_collator=DataCollatorForSeq2Seq(
+                tokenizer=self.tokenizer,
+                label_pad_token_id=-100,
+                pad_to_multiple_of=8,
+            ),
+        )
+        
+        trainer.train()
+        
+        # Save final model
+        final_dir = f"{self.output_dir}/final"
+        trainer.save_model(final_dir)
+        self.tokenizer.save_pretrained(final_dir)
+        
+        print(f"Training complete! Model saved to {final_dir}")
+
+if __name__ == "__main__":
+    trainer = TenaliInstructionTrainer()
+    trainer.load_model_with_lora()
+    trainer.load_dataset()
+    trainer.train()
+    
+    print("Instruction fine-tuning complete!")
+    print("Tenali is ready for deployment!")
@@ -0,0 +1,82 @@
+"""
+Helpers shared by the Tenali trainers
+Tokenized-dataset caching, attention backend selection and micro-batch probing
+"""
+
+import torch
+from accelerate import PartialState
+from datasets import Sequence, Value, load_from_disk
+from pathlib import Path
+import hashlib
+import importlib.util
+
+# Bump when the tokenization output changes so stale on-disk caches are ignored
+TOKENIZATION_VERSION = 3
+
+def tokenized_cache_dir(data_paths, tokenizer, max_length):
+    """
+    Cache location for the tokenized splits, addressed by what shapes them: the tokenizer,
+    max_length and when the source datasets were last saved, so re-preparing invalidates it
+    """
+    # save_to_disk rewrites state.json; map() cache files written alongside it don't count
+    data_mtime = max((Path(d) / 'state.json').stat().st_mtime_ns for d in data_paths)
+    key = f"{TOKENIZATION_VERSION}|{tokenizer.name_or_path}|{max_length}|{data_mtime}"
+    return Path(data_paths[0]).parent / '.tokenized' / hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def load_tokenized(data_paths, tokenizer, max_length, tokenize):
+    """
+    Tokenized DatasetDict (train/validation) from the on-disk cache, building it with
+    `tokenize()` on a miss. The main process builds first; other ranks wait, then load its cache.
+    """
+    cache_dir = tokenized_cache_dir(data_paths, tokenizer, max_length)
+    with PartialState().main_process_first():
+        if cache_dir.exists():
+            print(f"Loading tokenized dataset from {cache_dir}...")
+            return load_from_disk(str(cache_dir))  # memory-mapped
+
+        # Vocab ids fit in int32, halving storage and loader traffic; the collator builds
+        # int64 tensors per batch for the embedding lookup
+        tokenized = tokenize()
+        tokenized = tokenized.cast_column('input_ids', Sequence(Value('int32')))
+        tokenized = tokenized.cast_column('labels', Sequence(Value('int32')))
+
+        # Written under a temporary name and renamed, so an interrupted save is never reused
+        tmp_dir = cache_dir.with_name(cache_dir.name + '.tmp')
+        tokenized.save_to_disk(str(tmp_dir))
+        tmp_dir.rename(cache_dir)
+        print(f"Cached tokenized dataset at {cache_dir}")
+        return tokenized
+
+def attn_implementation():
+    """FlashAttention-2 when flash_attn is installed, otherwise PyTorch's fused SDPA kernels"""
+    return "flash_attention_2" if importlib.util.find_spec("flash_attn") else "sdpa"
+
+def probe_batch_size(model, pad_token_id, max_length, candidates=(8, 4, 2, 1)):
+    """
+    Largest micro-batch whose forward+backward+AdamW step at max_length fits in VRAM,
+    agreed across ranks (the minimum) so DDP replicas use the same batch size
+    """
+    model.train()
+    params = [p for p in model.parameters() if p.requires_grad]
+    fits = 1
+    for batch_size in candidates:
+        input_ids = torch.full((batch_size, max_length), pad_token_id, device=model.device)
+        # lr=0 and no decay: the step allocates the optimizer state without moving any weight
+        optimizer = torch.optim.AdamW(params, lr=0.0, weight_decay=0.0)
+        try:
+            model(input_ids=input_ids, labels=input_ids).loss.backward()
+            optimizer.step()
+            fits = batch_size
+            break
+        except torch.cuda.OutOfMemoryError:
+            continue
+        finally:
+            model.zero_grad(set_to_none=True)
+            del input_ids, optimizer
+            torch.cuda.empty_cache()
+    
+    if torch.distributed.is_available() and torch.distributed.is_initialized():
+        fits = torch.tensor(fits, device=model.device)
+        torch.distributed.all_reduce(fits, op=torch.distributed.ReduceOp.MIN)
+        fits = int(fits.item())
+    return fits